@@ -0,0 +1,194 @@
+"""Tempos dos caminhos críticos com dados sintéticos e APIs substituídas por versões locais.
+
+Uso: python -m benchmarks.desempenho [--tamanhos 1000 10000] [--casos coleta_x apriori] [--comparar anterior.json]
+
+Nenhuma credencial nem rede externa é usada: Spotify, YouTube, X e pytrends são
+substituídos por clientes falsos e o Supabase por um stub local do PostgREST.
+Tudo roda num diretório temporário (SQLite, cache de respostas, modelo de clusters).
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# O diretório de trabalho muda para um temporário: os imports precisam da raiz explícita
+sys.path.insert(0, RAIZ)
+
+from benchmarks import sinteticos  # noqa: E402
+from benchmarks.tempo_importacao import DIR_RESULTADOS, _commit_atual  # noqa: E402
+
+TAMANHOS_PADRAO = [1000, 10000, 50000]
+REPETICOES_PADRAO = 3
+
+# Sem espera do balde de tokens: mede o código, não os limites dos provedores
+SEM_LIMITES = {servico: {"capacidade": 10**9, "taxa": 10.0**9, "cota": None, "janela": None}
+               for servico in ("spotify", "youtube", "x", "trends")}
+
+
+def _preparar_coletores():
+    from data import google_trends, spotify_data, x_data, youtube_data
+    from data.limites import AgendadorLimites
+    agendador = AgendadorLimites(SEM_LIMITES)
+    for modulo in (spotify_data, youtube_data, x_data, google_trends):
+        modulo.agendador = agendador
+
+
+def _linhas(esperadas):
+    return lambda df: getattr(df, "empty", True) is False and (esperadas is None or len(df) == esperadas)
+
+
+def _casos(dados, supabase, stub):
+    """Nome -> (preparação, função medida, verificação do resultado).
+
+    Preparação e verificação rodam fora da medição. Coletores e gravadores devolvem
+    DataFrame vazio ou False quando falham, então a verificação impede que um caminho
+    quebrado seja medido como um sucesso rápido.
+    """
+    from data import db_manager, supabase_manager
+    from data.cache_respostas import cache
+    from data.google_trends import coletar_dados_trends
+    from data.spotify_data import coletar_dados_spotify
+    from data.x_data import coletar_dados_x
+    from data.youtube_data import coletar_dados_youtube
+    from insights import agregacoes, aprendizado, clusterizacao
+    from insights.recomendacao import calcular_scores
+
+    n = len(dados["x"])
+    nada = lambda: None  # noqa: E731
+    # Visão "youtube_atual": uma linha por chave natural, acumulando os tamanhos anteriores
+    chaves_youtube = len(dados["youtube"].drop_duplicates(["titulo", "canal"]))
+
+    def gravar_supabase():
+        return supabase_manager.salvar_df_supabase(dados["x"], "twitter", supabase=supabase)
+
+    def preparar_leitura_supabase():
+        gravar_supabase()
+        cache.invalidar("supabase:twitter")
+
+    def recomendacao():
+        return calcular_scores(dados["spotify"], dados["youtube"], dados["trends"], dados["x"])
+
+    def preparar_apriori():
+        aprendizado._minerar_regras.clear()
+
+    def clusters():
+        clusterizacao.atualizar_clusters(dados["spotify"], dados["youtube"])
+        return aprendizado.analisar_clusters(dados["spotify"], dados["youtube"])
+
+    def preparar_clusters():
+        # Estado zerado: cada repetição treina do início
+        clusterizacao._estados.clear()
+        if os.path.exists(clusterizacao.CAMINHO_MODELO):
+            os.remove(clusterizacao.CAMINHO_MODELO)
+
+    return {
+        "coleta_spotify": (nada, lambda: coletar_dados_spotify(usar_cache=False), _linhas(None)),
+        "coleta_youtube": (nada, lambda: coletar_dados_youtube(max_itens=n, usar_cache=False), _linhas(n)),
+        "coleta_x": (nada, lambda: coletar_dados_x(max_itens=n, usar_cache=False), _linhas(n)),
+        "coleta_trends": (nada, lambda: coletar_dados_trends(usar_cache=False), _linhas(n)),
+        "supabase_gravar": (stub.limpar, gravar_supabase, lambda ok: ok is True and len(stub.linhas("twitter")) == n),
+        "supabase_ler": (preparar_leitura_supabase,
+                         lambda: supabase_manager.carregar_df_supabase("twitter", ["id", "assunto", "volume", "created_at"],
+                                                                       supabase=supabase),
+                         _linhas(n)),
+        "sqlite_gravar": (nada, lambda: db_manager.salvar_df_em_tabela(dados["youtube"], "youtube"), lambda ok: ok is True),
+        "sqlite_ler": (nada, lambda: db_manager.carregar_estado_atual("youtube"),
+                       lambda df: len(df) >= chaves_youtube),
+        # Primeira chamada por versão dos dados (índices e SimHash) e chamada com os índices em cache
+        "recomendacao": (agregacoes.limpar_cache, recomendacao, _linhas(None)),
+        "recomendacao_cache": (nada, recomendacao, _linhas(None)),
+        "apriori": (preparar_apriori, lambda: aprendizado.analisar_apriori(dados["trends"], dados["x"]), _linhas(None)),
+        "clusters": (preparar_clusters, clusters, _linhas(len(dados["spotify"]) + len(dados["youtube"]))),
+    }
+
+
+def medir(preparacao, funcao, repeticoes, verificacao=None, nome="caso"):
+    tempos = []
+    for _ in range(repeticoes):
+        preparacao()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        if verificacao is not None and not verificacao(resultado):
+            raise RuntimeError(f"{nome}: resultado inesperado ({type(resultado).__name__}); veja os logs de erro")
+    return {"min_ms": round(min(tempos), 2), "mediana_ms": round(statistics.median(tempos), 2), "repeticoes": repeticoes}
+
+
+def executar(tamanhos, casos=None, repeticoes=REPETICOES_PADRAO):
+    resultados = {}
+    diretorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench-") as diretorio, sinteticos.ServidorPostgrest() as stub:
+        os.chdir(diretorio)
+        try:
+            _preparar_coletores()
+            supabase = stub.cliente()
+            aquecidos = set()
+            for n in tamanhos:
+                sinteticos.instalar_clientes_falsos(n)
+                dados = {
+                    "spotify": sinteticos.gerar_spotify(n),
+                    "youtube": sinteticos.gerar_youtube(n),
+                    "trends": sinteticos.gerar_trends(max(1, n // 50)),
+                    "x": sinteticos.gerar_x(n),
+                }
+                for nome, (preparacao, funcao, verificacao) in _casos(dados, supabase, stub).items():
+                    if casos and nome not in casos:
+                        continue
+                    if nome not in aquecidos:
+                        # Primeira chamada fora da medição: imports tardios (nltk, mlxtend, sklearn)
+                        medir(preparacao, funcao, 1, verificacao, nome)
+                        aquecidos.add(nome)
+                    medida = medir(preparacao, funcao, repeticoes, verificacao, nome)
+                    resultados.setdefault(nome, {})[str(n)] = medida
+                    print(f"{nome:18s} n={n:<7d} {medida['min_ms']:10.1f} ms (mediana {medida['mediana_ms']:.1f})")
+        finally:
+            os.chdir(diretorio_original)
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", nargs="+", type=int, default=TAMANHOS_PADRAO)
+    parser.add_argument("--casos", nargs="+", help="subconjunto dos casos (padrão: todos)")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES_PADRAO)
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: benchmarks/resultados/desempenho-<data>.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para mostrar a diferença")
+    args = parser.parse_args(argv)
+
+    # Logs de cada página coletada e avisos do Streamlit fora do servidor poluiriam a saída;
+    # erros continuam aparecendo
+    logging.disable(logging.WARNING)
+    resultado = {
+        "tipo": "desempenho",
+        "commit": _commit_atual(),
+        "python": sys.version.split()[0],
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "tamanhos": args.tamanhos,
+        "casos": executar(args.tamanhos, args.casos, args.repeticoes),
+    }
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo).get("casos", {})
+        print("\nDiferença para a execução anterior (tempo mínimo):")
+        for nome, por_tamanho in resultado["casos"].items():
+            for n, medida in por_tamanho.items():
+                antes = anterior.get(nome, {}).get(n, {}).get("min_ms")
+                if antes:
+                    print(f"{nome:18s} n={n:<7s} {medida['min_ms'] - antes:+10.1f} ms ({medida['min_ms'] / antes - 1:+.0%})")
+
+    saida = args.saida or os.path.join(DIR_RESULTADOS, f"desempenho-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"Relatório salvo em {saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""Dados sintéticos no esquema de cada fonte e substitutos locais das APIs.
+
+Os geradores são determinísticos (semente fixa) e sorteiam palavras com distribuição
+de Zipf, como em texto real: os termos das tendências aparecem nos tweets e nos
+títulos, então pontuação, regras de associação e agrupamento têm o que encontrar.
+"""
+import json
+import random
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+
+TAMANHO_VOCABULARIO = 2000
+# Chave no formato JWT aceita pelo cliente supabase-py (o stub não a valida)
+CHAVE_STUB = "eyJhbGciOiJIUzI1NiJ9.e30.stub"
+
+
+def vocabulario(tamanho=TAMANHO_VOCABULARIO, semente=0):
+    gerador = np.random.default_rng(semente)
+    letras = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    return np.array(["".join(gerador.choice(letras, gerador.integers(4, 10))) for _ in range(tamanho)], dtype=object)
+
+
+def _textos(gerador, palavras, n, min_palavras, max_palavras):
+    # Índices com distribuição de Zipf: poucas palavras muito frequentes, cauda longa
+    tamanhos = gerador.integers(min_palavras, max_palavras + 1, n)
+    indices = np.minimum(gerador.zipf(1.3, tamanhos.sum()) - 1, len(palavras) - 1)
+    partes = np.split(palavras[indices], np.cumsum(tamanhos)[:-1])
+    return [" ".join(p) for p in partes]
+
+
+def gerar_spotify(n, semente=0):
+    gerador = np.random.default_rng(semente)
+    palavras = vocabulario()
+    artistas = _textos(gerador, palavras, max(1, n // 20), 1, 2)
+    return pd.DataFrame({
+        "nome": _textos(gerador, palavras, n, 1, 4),
+        "artista": gerador.choice(np.array(artistas, dtype=object), n),
+        "popularidade": gerador.integers(0, 101, n),
+    })
+
+
+def gerar_youtube(n, semente=0):
+    gerador = np.random.default_rng(semente + 1)
+    palavras = vocabulario()
+    canais = _textos(gerador, palavras, max(1, n // 10), 1, 2)
+    visualizacoes = gerador.lognormal(11, 2, n).astype("int64")
+    return pd.DataFrame({
+        "titulo": _textos(gerador, palavras, n, 3, 10),
+        "canal": gerador.choice(np.array(canais, dtype=object), n),
+        "visualizacoes": visualizacoes,
+        "likes": (visualizacoes * gerador.uniform(0.001, 0.08, n)).astype("int64"),
+    })
+
+
+def gerar_trends(n, semente=0, dias=7):
+    gerador = np.random.default_rng(semente + 2)
+    palavras = vocabulario()
+    hoje = datetime.now(timezone.utc).date()
+    datas = [(hoje - timedelta(days=int(d))).isoformat() for d in gerador.integers(0, dias, n)]
+    return pd.DataFrame({"termo": _textos(gerador, palavras, n, 1, 3), "data": datas})
+
+
+def gerar_x(n, semente=0, horas=72):
+    gerador = np.random.default_rng(semente + 3)
+    palavras = vocabulario()
+    textos = _textos(gerador, palavras, n, 5, 20)
+    # Uma parcela de retweets com sufixo: quase duplicatas, como na busca real
+    repetidos = gerador.random(n) < 0.1
+    origem = gerador.integers(0, n, n)
+    textos = [f"{textos[o]} #rt" if r else t for t, r, o in zip(textos, repetidos, origem)]
+    fim = pd.Timestamp.now(tz="UTC")
+    return pd.DataFrame({
+        "id": [str(10**18 + i) for i in range(n)],
+        "assunto": textos,
+        "volume": gerador.lognormal(6, 1.5, n).astype("int64"),
+        "created_at": (fim - pd.to_timedelta(gerador.uniform(0, horas * 3600, n), unit="s")).floor("s"),
+    })
+
+
+# --- Substitutos dos clientes, registrados com data.clientes.registrar_cliente ---
+
+class SpotifyFalso:
+    def __init__(self, df):
+        self.df = df
+
+    def search(self, q, type="track", limit=10, **kwargs):
+        linhas = self.df.head(limit)
+        return {"tracks": {"items": [
+            {"name": nome, "artists": [{"name": artista}], "popularity": int(popularidade)}
+            for nome, artista, popularidade in linhas.itertuples(index=False)
+        ]}}
+
+
+class YouTubeFalso:
+    """Imita youtube.videos().list(...).execute(), paginando com nextPageToken."""
+
+    def __init__(self, df):
+        self.df = df
+
+    def videos(self):
+        return self
+
+    def list(self, part=None, chart=None, regionCode=None, maxResults=5, pageToken=None, **kwargs):
+        inicio = int(pageToken or 0)
+        linhas = self.df.iloc[inicio:inicio + maxResults]
+        resposta = {"items": [
+            {"snippet": {"title": titulo, "channelTitle": canal},
+             "statistics": {"viewCount": str(views), "likeCount": str(likes)}}
+            for titulo, canal, views, likes in linhas.itertuples(index=False)
+        ]}
+        if inicio + maxResults < len(self.df):
+            resposta["nextPageToken"] = str(inicio + maxResults)
+        return SimpleNamespace(execute=lambda http=None: resposta)
+
+
+class XFalso:
+    def __init__(self, df):
+        self.df = df
+
+    def search_recent_tweets(self, query, max_results=10, next_token=None, **kwargs):
+        inicio = int(next_token or 0)
+        linhas = self.df.iloc[inicio:inicio + max_results]
+        tweets = [SimpleNamespace(id=int(id_), text=texto, public_metrics={"impression_count": int(volume)},
+                                  created_at=criado.to_pydatetime())
+                  for id_, texto, volume, criado in linhas.itertuples(index=False)]
+        meta = {"result_count": len(tweets)}
+        if inicio + max_results < len(self.df):
+            meta["next_token"] = str(inicio + max_results)
+        return SimpleNamespace(data=tweets or None, meta=meta)
+
+
+class TrendsFalso:
+    def __init__(self, df):
+        self.df = df
+
+    def trending_searches(self, pn="brazil"):
+        return pd.DataFrame({0: self.df["termo"].to_numpy()})
+
+    def build_payload(self, kw_list, **kwargs):
+        self.kw_list = kw_list
+
+    def interest_over_time(self):
+        datas = pd.date_range(end=pd.Timestamp.now().floor("h"), periods=168, freq="h")
+        gerador = np.random.default_rng(0)
+        return pd.DataFrame({kw: gerador.integers(0, 101, len(datas)) for kw in self.kw_list}, index=datas).rename_axis("date")
+
+
+# --- Stub do PostgREST (Supabase) em memória ---
+
+def _ordenavel(valor):
+    # Compara como o Postgres compara colunas tipadas: números como números e datas como
+    # instantes (o JSON traz "2026-10-18T10:02:04+00:00", o filtro pode vir com espaço)
+    texto = str(valor)
+    for converter in (int, float):
+        try:
+            return 0, converter(texto), ""
+        except ValueError:
+            pass
+    try:
+        instante = datetime.fromisoformat(texto.replace("Z", "+00:00"))
+        if instante.tzinfo is None:
+            instante = instante.replace(tzinfo=timezone.utc)
+        return 1, instante.timestamp(), ""
+    except ValueError:
+        return 2, 0, texto
+
+
+class _ManipuladorPostgrest(BaseHTTPRequestHandler):
+    """Atende upsert (POST com on_conflict) e select paginado (offset/limit, gt, order)."""
+
+    def _tabela(self):
+        return urlparse(self.path).path.rstrip("/").split("/")[-1]
+
+    def _erro(self, status, codigo, mensagem):
+        # Mesmo formato de erro do PostgREST; o cliente levanta APIError
+        self._responder(status, {"code": codigo, "details": None, "hint": None, "message": mensagem})
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        registros = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if isinstance(registros, dict):
+            registros = [registros]
+        chaves = parse_qs(urlparse(self.path).query).get("on_conflict", [""])[0].split(",")
+        with self.server.lock:
+            self.server.requisicoes.append(("POST", self._tabela(), len(registros)))
+            falhar = self.server.falhas > 0
+            if falhar:
+                self.server.falhas -= 1
+        if falhar:
+            return self._erro(503, "PGRST000", "falha simulada pelo stub")
+        with self.server.lock:
+            tabela = self.server.tabelas.setdefault(self._tabela(), {})
+            self.server.colunas.setdefault(self._tabela(), {"atualizado_em"}).update(c for r in registros for c in r)
+            for registro in registros:
+                chave = tuple(registro.get(c) for c in chaves) if chaves != [""] else len(tabela)
+                # Default e gatilho de esquema_supabase.sql: insert e update avançam atualizado_em
+                tabela[chave] = {**registro, "atualizado_em": datetime.now(timezone.utc).isoformat()}
+        self._responder(201, [])
+
+    def do_GET(self):
+        tabela = self._tabela()
+        parametros = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        with self.server.lock:
+            if tabela not in self.server.tabelas:
+                return self._erro(404, "42P01", f'relation "public.{tabela}" does not exist')
+            linhas = list(self.server.tabelas[tabela].values())
+            conhecidas = set(self.server.colunas.get(tabela, ()))
+        seletor = parametros.get("select", "*")
+        colunas = None if seletor == "*" else seletor.split(",")
+        filtros = {c: v for c, v in parametros.items() if c not in ("select", "order", "offset", "limit")}
+        ordem = [termo.split(".") for termo in parametros["order"].split(",")] if "order" in parametros else []
+        for coluna in (colunas or []) + list(filtros) + [termo[0] for termo in ordem]:
+            if coluna not in conhecidas:
+                return self._erro(400, "42703", f"column {tabela}.{coluna} does not exist")
+        for coluna, valor in filtros.items():
+            filtro = re.match(r"gt\.(.*)", valor)
+            if filtro:
+                limite = _ordenavel(filtro.group(1))
+                linhas = [l for l in linhas if l.get(coluna) is not None and _ordenavel(l[coluna]) > limite]
+        if ordem:
+            # Ordenações estáveis da última chave para a primeira = ORDER BY com várias colunas
+            for coluna, *sentido in reversed(ordem):
+                linhas.sort(key=lambda l: _ordenavel(l.get(coluna)), reverse="desc" in sentido)
+        else:
+            # Como no Postgres, sem ORDER BY a ordem das linhas não é garantida entre requisições
+            random.shuffle(linhas)
+        inicio = int(parametros.get("offset", 0))
+        linhas = linhas[inicio:inicio + int(parametros.get("limit", len(linhas)))]
+        if colunas:
+            linhas = [{c: l.get(c) for c in colunas} for l in linhas]
+        self._responder(200, linhas)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorPostgrest:
+    """Servidor HTTP local que se passa pelo Supabase; use como context manager."""
+
+    def __init__(self):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ManipuladorPostgrest)
+        self.servidor.tabelas = {}
+        self.servidor.colunas = {}
+        self.servidor.requisicoes = []
+        self.servidor.falhas = 0
+        self.servidor.lock = threading.Lock()
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def cliente(self):
+        from supabase import create_client
+        return create_client(self.url, CHAVE_STUB)
+
+    def falhar(self, vezes):
+        """As próximas `vezes` gravações respondem 503, para exercitar as novas tentativas."""
+        with self.servidor.lock:
+            self.servidor.falhas = vezes
+
+    @property
+    def requisicoes(self):
+        # (método, tabela, registros) de cada gravação recebida, inclusive as que falharam
+        with self.servidor.lock:
+            return list(self.servidor.requisicoes)
+
+    def linhas(self, tabela):
+        with self.servidor.lock:
+            return list(self.servidor.tabelas.get(tabela, {}).values())
+
+    def limpar(self):
+        # Esvazia as tabelas sem apagá-las, como um TRUNCATE
+        with self.servidor.lock:
+            for tabela in self.servidor.tabelas.values():
+                tabela.clear()
+            self.servidor.requisicoes.clear()
+            self.servidor.falhas = 0
+
+
+def instalar_clientes_falsos(n, semente=0):
+    """Registra substitutos de Spotify, YouTube, X e pytrends servindo `n` itens sintéticos."""
+    from data.clientes import registrar_cliente
+    registrar_cliente("spotify", SpotifyFalso(gerar_spotify(n, semente)))
+    registrar_cliente("youtube", YouTubeFalso(gerar_youtube(n, semente)))
+    registrar_cliente("x", XFalso(gerar_x(n, semente)))
+    registrar_cliente("trends", TrendsFalso(gerar_trends(n, semente)))
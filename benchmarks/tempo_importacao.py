@@ -0,0 +1,111 @@
+"""Relatório do custo de importação de cada módulo do dashboard.
+
+Uso: python -m benchmarks.tempo_importacao [--saida arquivo.json] [--comparar anterior.json]
+
+Cada módulo é importado em um interpretador novo com `-X importtime`, então o tempo
+medido inclui todas as dependências que ele puxa. O JSON gerado pode ser guardado
+por versão e comparado com `--comparar`.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Caminho de inicialização do dashboard e as seções carregadas sob demanda
+MODULOS = [
+    "streamlit",
+    "pandas",
+    "data.snapshots",
+    "data.supabase_manager",
+    "data.coleta",
+    "data.spotify_data",
+    "data.youtube_data",
+    "data.google_trends",
+    "data.x_data",
+    "insights.recomendacao",
+    "insights.visualizacoes",
+    "insights.aprendizado",
+    "insights.clusterizacao",
+    "mlxtend.frequent_patterns",
+]
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIR_RESULTADOS = os.path.join(RAIZ, "benchmarks", "resultados")
+
+
+def medir_modulo(modulo, repeticoes=3):
+    """Menor tempo (ms) entre `repeticoes` importações a frio e as dependências mais caras."""
+    melhor, dependencias = None, {}
+    for _ in range(repeticoes):
+        processo = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+            cwd=RAIZ, capture_output=True, text=True,
+        )
+        if processo.returncode != 0:
+            return {"erro": processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else "falha"}
+        medidas = {}
+        for linha in processo.stderr.splitlines():
+            if not linha.startswith("import time:") or "cumulative" in linha:
+                continue
+            # "import time:  <próprio µs> | <acumulado µs> | <módulo>" (indentado pela profundidade)
+            _, acumulado, nome = [parte.strip() for parte in linha.split(":", 1)[1].split("|")]
+            medidas[nome] = int(acumulado) / 1000
+        total = medidas.get(modulo)
+        if total is not None and (melhor is None or total < melhor):
+            melhor, dependencias = total, medidas
+    # Só pacotes de primeiro nível: é onde aparece o custo de tweepy, plotly, mlxtend...
+    raizes = {nome: ms for nome, ms in dependencias.items() if "." not in nome and nome != modulo.split(".")[0]}
+    mais_caras = dict(sorted(raizes.items(), key=lambda item: item[1], reverse=True)[:10])
+    return {"total_ms": melhor, "dependencias_ms": mais_caras}
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modulos", nargs="+", default=MODULOS)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: benchmarks/resultados/importacao-<data>.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para mostrar a diferença")
+    args = parser.parse_args(argv)
+
+    resultado = {
+        "tipo": "importacao",
+        "commit": _commit_atual(),
+        "python": sys.version.split()[0],
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "modulos": {modulo: medir_modulo(modulo, args.repeticoes) for modulo in args.modulos},
+    }
+    anterior = {}
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo).get("modulos", {})
+
+    for modulo, medida in resultado["modulos"].items():
+        if "erro" in medida:
+            print(f"{modulo:32s}  erro: {medida['erro']}")
+            continue
+        linha = f"{modulo:32s} {medida['total_ms']:9.1f} ms"
+        antes = anterior.get(modulo, {}).get("total_ms")
+        if antes:
+            linha += f"  ({medida['total_ms'] - antes:+.1f} ms)"
+        print(linha)
+
+    saida = args.saida or os.path.join(DIR_RESULTADOS, f"importacao-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"Relatório salvo em {saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
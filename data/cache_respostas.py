@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from data.instrumentacao import contar
+
+logger = logging.getLogger(__name__)
+
+DIR_CACHE = os.path.join(".cache", "respostas")
+
+# TTL (segundos) e se a fonte também vai para o disco. Leituras do Supabase ficam só em
+# memória: são grandes e são invalidadas a cada gravação.
+CONFIG_PADRAO = {
+    "spotify": {"ttl": 600, "disco": True},
+    "youtube": {"ttl": 900, "disco": True},   # o ranking mostPopular muda devagar e a cota é diária
+    "trends": {"ttl": 1800, "disco": True},
+    "x": {"ttl": 900, "disco": True},         # mesma janela do limite de 15 min da busca recente
+    "supabase": {"ttl": 300, "disco": False},
+}
+TTL_PADRAO = 600
+MAX_ITENS_MEMORIA = 256
+
+
+class CacheRespostas:
+    """Cache de respostas de API com TTL por fonte, em memória (LRU) e em disco (pickle)."""
+
+    def __init__(self, diretorio=DIR_CACHE, config=None, max_itens_memoria=MAX_ITENS_MEMORIA):
+        self.diretorio = diretorio
+        self.config = {**CONFIG_PADRAO, **(config or {})}
+        self.max_itens_memoria = max_itens_memoria
+        self._memoria = OrderedDict()  # chave -> (fonte, expira_em, valor)
+        self._lock = threading.Lock()
+        self._estatisticas = {}
+
+    def _config_fonte(self, fonte):
+        # "supabase:spotify" usa a configuração de "supabase"
+        return self.config.get(fonte, self.config.get(fonte.split(":")[0], {"ttl": TTL_PADRAO, "disco": True}))
+
+    def _contar(self, fonte, evento):
+        contadores = self._estatisticas.setdefault(fonte, {"acertos_memoria": 0, "acertos_disco": 0, "faltas": 0})
+        contadores[evento] += 1
+        contar("cache", fonte=fonte.split(":")[0], evento=evento)
+
+    @staticmethod
+    def chave(fonte, endpoint, params):
+        conteudo = json.dumps([fonte, endpoint, params], sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    def _caminho(self, fonte, chave):
+        return os.path.join(self.diretorio, fonte.replace(":", "_"), f"{chave}.pkl")
+
+    def obter(self, fonte, endpoint, params):
+        """Devolve (True, valor) se houver resposta válida em cache, senão (False, None)."""
+        chave = self.chave(fonte, endpoint, params)
+        agora = time.time()
+        with self._lock:
+            item = self._memoria.get(chave)
+            if item is not None:
+                if item[1] > agora:
+                    self._memoria.move_to_end(chave)
+                    self._contar(fonte, "acertos_memoria")
+                    return True, item[2]
+                del self._memoria[chave]
+        if self._config_fonte(fonte)["disco"]:
+            caminho = self._caminho(fonte, chave)
+            try:
+                with open(caminho, "rb") as arquivo:
+                    expira_em, valor = pickle.load(arquivo)
+                if expira_em > agora:
+                    with self._lock:
+                        self._guardar_memoria(chave, fonte, expira_em, valor)
+                        self._contar(fonte, "acertos_disco")
+                    return True, valor
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Entrada de cache corrompida em {caminho}: {str(e)}")
+        with self._lock:
+            self._contar(fonte, "faltas")
+        return False, None
+
+    def _guardar_memoria(self, chave, fonte, expira_em, valor):
+        self._memoria[chave] = (fonte, expira_em, valor)
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens_memoria:
+            self._memoria.popitem(last=False)
+
+    def guardar(self, fonte, endpoint, params, valor, ttl=None):
+        config = self._config_fonte(fonte)
+        chave = self.chave(fonte, endpoint, params)
+        expira_em = time.time() + (ttl if ttl is not None else config["ttl"])
+        with self._lock:
+            self._guardar_memoria(chave, fonte, expira_em, valor)
+        if config["disco"]:
+            caminho = self._caminho(fonte, chave)
+            try:
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                # Arquivo temporário + rename: outro processo nunca lê um pickle incompleto
+                temporario = f"{caminho}.{threading.get_ident()}.tmp"
+                with open(temporario, "wb") as arquivo:
+                    pickle.dump((expira_em, valor), arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporario, caminho)
+            except Exception as e:
+                logger.warning(f"Não foi possível gravar cache de {fonte} em disco: {str(e)}")
+
+    def obter_ou_calcular(self, fonte, endpoint, params, funcao, ttl=None, forcar=False):
+        """Devolve a resposta em cache ou chama `funcao()` e guarda o resultado. `forcar` ignora o cache."""
+        if not forcar:
+            achou, valor = self.obter(fonte, endpoint, params)
+            if achou:
+                return valor
+        valor = funcao()
+        self.guardar(fonte, endpoint, params, valor, ttl)
+        return valor
+
+    def invalidar(self, fonte=None):
+        """Descarta as entradas de `fonte` (ou todas), em memória e em disco."""
+        with self._lock:
+            for chave in [c for c, item in self._memoria.items() if fonte is None or item[0] == fonte]:
+                del self._memoria[chave]
+        diretorio = self.diretorio if fonte is None else os.path.join(self.diretorio, fonte.replace(":", "_"))
+        for raiz, _, arquivos in os.walk(diretorio):
+            for nome in arquivos:
+                if nome.endswith(".pkl"):
+                    try:
+                        os.remove(os.path.join(raiz, nome))
+                    except FileNotFoundError:
+                        pass
+        logger.info(f"Cache invalidado: {fonte or 'todas as fontes'}")
+
+    def estatisticas(self):
+        with self._lock:
+            resultado = {}
+            for fonte, contadores in self._estatisticas.items():
+                consultas = sum(contadores.values())
+                acertos = contadores["acertos_memoria"] + contadores["acertos_disco"]
+                resultado[fonte] = {**contadores, "taxa_acerto": acertos / consultas if consultas else 0.0}
+            return resultado
+
+
+# Instância única do processo, compartilhada por coletores e carregamento do Supabase
+cache = CacheRespostas()
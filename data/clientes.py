@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from data.credenciais import obter_credencial
+
+logger = logging.getLogger(__name__)
+
+# Registro do processo: sobrevive a reruns e é compartilhado entre sessões do Streamlit
+_clientes = {}  # nome -> (cliente, expira_em)
+_locks = {}
+_lock_registro = threading.Lock()
+# Conexões que não podem ser compartilhadas entre threads (httplib2), uma por thread
+_por_thread = threading.local()
+
+
+def _lock_para(nome):
+    with _lock_registro:
+        return _locks.setdefault(nome, threading.Lock())
+
+
+def obter_cliente(nome, fabrica, ttl=None):
+    """Devolve o cliente `nome`, criando-o com `fabrica()` só na primeira vez ou após `ttl` segundos."""
+    with _lock_para(nome):
+        cliente, expira_em = _clientes.get(nome, (None, None))
+        if cliente is not None and (expira_em is None or time.monotonic() < expira_em):
+            return cliente
+        logger.info(f"Criando cliente {nome}")
+        cliente = fabrica()
+        _clientes[nome] = (cliente, time.monotonic() + ttl if ttl else None)
+        return cliente
+
+
+def registrar_cliente(nome, cliente):
+    # Permite injetar clientes falsos (testes, benchmarks)
+    with _lock_para(nome):
+        _clientes[nome] = (cliente, None)
+
+
+def descartar_cliente(nome=None):
+    with _lock_registro:
+        if nome is None:
+            _clientes.clear()
+        else:
+            _clientes.pop(nome, None)
+
+
+def criar_sessao_http(pool=10):
+    # Sessão com keep-alive e pool de conexões reaproveitado entre chamadas
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=pool, pool_maxsize=pool)
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    return sessao
+
+
+def _criar_supabase():
+    from supabase import create_client
+    return create_client(obter_credencial("supabase", "url"), obter_credencial("supabase", "key"))
+
+
+def _criar_spotify():
+    import spotipy
+    from spotipy.cache_handler import MemoryCacheHandler
+    from spotipy.oauth2 import SpotifyClientCredentials
+    sessao = criar_sessao_http()
+    # O token fica em memória e só é renovado quando expira
+    auth_manager = SpotifyClientCredentials(
+        client_id=obter_credencial("spotify", "client_id"),
+        client_secret=obter_credencial("spotify", "client_secret"),
+        cache_handler=MemoryCacheHandler(),
+        requests_session=sessao,
+    )
+    return spotipy.Spotify(auth_manager=auth_manager, requests_session=sessao)
+
+
+def _criar_youtube():
+    import googleapiclient.discovery
+    # Documento de descoberta embarcado na biblioteca: nenhuma requisição extra
+    return googleapiclient.discovery.build(
+        "youtube", "v3", developerKey=obter_credencial("youtube", "api_key"),
+        static_discovery=True, cache_discovery=False,
+    )
+
+
+def http_da_thread():
+    """httplib2.Http da thread atual, para `request.execute(http=...)` do googleapiclient.
+
+    O serviço montado pela descoberta é compartilhado, mas o httplib2.Http que ele carrega
+    não é thread-safe: sessões do Streamlit e coletores abandonados pelo prazo rodam juntos.
+    """
+    http = getattr(_por_thread, "http", None)
+    if http is None:
+        from googleapiclient.http import build_http
+        http = _por_thread.http = build_http()
+    return http
+
+
+def _criar_x():
+    import tweepy
+    # tweepy.Client mantém a própria requests.Session
+    return tweepy.Client(bearer_token=obter_credencial("x", "bearer_token"))
+
+
+def _criar_trends():
+    from pytrends.request import TrendReq
+    return TrendReq(hl='pt-BR', tz=360)
+
+
+def cliente_supabase():
+    return obter_cliente("supabase", _criar_supabase)
+
+
+def cliente_spotify():
+    return obter_cliente("spotify", _criar_spotify)
+
+
+def cliente_youtube():
+    return obter_cliente("youtube", _criar_youtube)
+
+
+def cliente_x():
+    return obter_cliente("x", _criar_x)
+
+
+def cliente_trends():
+    # Cookies do Google expiram; recria a sessão do pytrends a cada hora
+    return obter_cliente("trends", _criar_trends, ttl=3600)
@@ -0,0 +1,286 @@
+import logging
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from datetime import datetime, timezone
+import pandas as pd
+from data.instrumentacao import contar, medir
+
+logger = logging.getLogger(__name__)
+
+# Prazo padrão (segundos) de cada fonte; o retry com 2 ** attempt de cada coletor cabe nele
+PRAZO_PADRAO = 30.0
+# Linhas juntadas antes de cada gravação transmitida: lotes cheios para o Supabase e poucos
+# arquivos de snapshot, com a memória limitada a um lote
+TAMANHO_LOTE_GRAVACAO = 1000
+
+
+def _contexto_streamlit():
+    # Só consulta o Streamlit se o processo já o carregou (dashboard); a coleta headless nunca o importa
+    if "streamlit" not in sys.modules:
+        return None
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    return get_script_run_ctx(suppress_warning=True)
+
+
+def _executar_coletor(nome, coletor, ctx):
+    # Propaga o contexto do script para que chamadas st.* nas threads encontrem a sessão
+    if ctx is not None:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx
+        add_script_run_ctx(threading.current_thread(), ctx)
+    inicio = time.perf_counter()
+    try:
+        with medir("coleta", fonte=nome):
+            df = coletor()
+        return df, time.perf_counter() - inicio, None
+    except Exception as e:
+        return None, time.perf_counter() - inicio, e
+
+
+def coletar_fontes(coletores, prazos=None, max_workers=None):
+    """Executa os coletores em paralelo e devolve (dados, status).
+
+    `coletores` mapeia nome da fonte -> função sem argumentos que retorna um DataFrame
+    (ou, se já gravou os próprios lotes, o total de registros gravados).
+    `prazos` mapeia nome da fonte -> segundos (padrão PRAZO_PADRAO). Fontes que estouram
+    o prazo ficam de fora de `dados`; `status` traz situação, latência e registros por fonte.
+    """
+    prazos = prazos or {}
+    ctx = _contexto_streamlit()
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(coletores) or 1, thread_name_prefix="coleta")
+    inicio = time.perf_counter()
+    futuros = {nome: executor.submit(_executar_coletor, nome, coletor, ctx) for nome, coletor in coletores.items()}
+
+    dados, status = {}, {}
+    # Aguarda primeiro as fontes com prazo mais curto; o relógio é compartilhado por todas
+    for nome in sorted(futuros, key=lambda n: prazos.get(n, PRAZO_PADRAO)):
+        restante = max(0.0, prazos.get(nome, PRAZO_PADRAO) - (time.perf_counter() - inicio))
+        try:
+            df, latencia, erro = futuros[nome].result(timeout=restante)
+        except FuturesTimeoutError:
+            futuros[nome].cancel()
+            latencia = time.perf_counter() - inicio
+            logger.warning(f"Coleta de {nome} excedeu o prazo de {prazos.get(nome, PRAZO_PADRAO)}s")
+            status[nome] = {"status": "timeout", "latencia": latencia, "registros": 0, "erro": None}
+            continue
+
+        if erro is not None:
+            logger.error(f"Erro ao coletar {nome}: {str(erro)}")
+            status[nome] = {"status": "erro", "latencia": latencia, "registros": 0, "erro": str(erro)}
+        elif isinstance(df, int):
+            # Coletor transmitido: os lotes já foram gravados, só o total volta
+            status[nome] = {"status": "ok" if df else "vazio", "latencia": latencia, "registros": df, "erro": None}
+        elif not isinstance(df, pd.DataFrame):
+            status[nome] = {"status": "erro", "latencia": latencia, "registros": 0, "erro": "Dados inválidos"}
+        elif df.empty:
+            dados[nome] = df
+            status[nome] = {"status": "vazio", "latencia": latencia, "registros": 0, "erro": None}
+        else:
+            dados[nome] = df
+            status[nome] = {"status": "ok", "latencia": latencia, "registros": len(df), "erro": None}
+        logger.info(f"Coleta de {nome}: {status[nome]['status']} em {latencia:.2f}s")
+
+    for nome, info in status.items():
+        contar("coletas", fonte=nome, status=info["status"])
+        contar("registros_coletados", info["registros"], fonte=nome)
+
+    # Não espera threads atrasadas: elas terminam em segundo plano e o resultado é descartado
+    executor.shutdown(wait=False, cancel_futures=True)
+    logger.info(f"Coleta concluída em {time.perf_counter() - inicio:.2f}s")
+    return dados, status
+
+
+def _gravar(df, fonte, gravadores):
+    """Passa `df` a cada gravador; devolve os nomes dos que falharam.
+
+    salvar_df_supabase e salvar_df_em_tabela sinalizam falha devolvendo False em vez de
+    levantar exceção, então os dois casos contam.
+    """
+    falhas = []
+    for gravar in gravadores:
+        try:
+            ok = gravar(df, fonte) is not False
+        except Exception as e:
+            logger.error(f"Erro ao gravar {fonte} com {gravar.__name__}: {str(e)}")
+            ok = False
+        if not ok:
+            falhas.append(gravar.__name__)
+    if falhas:
+        logger.error(f"Gravação de {len(df)} registros de {fonte} falhou em {', '.join(falhas)}")
+    return falhas
+
+
+def _marcar_falhas(status, falhas):
+    # Coleta bem-sucedida mas não gravada não é sucesso: o ciclo (e o código de saída) falha
+    for nome, gravadores in falhas.items():
+        if gravadores and nome in status:
+            status[nome]["status"] = "erro_gravacao"
+            status[nome]["erro"] = f"falha ao gravar com {', '.join(sorted(gravadores))}"
+            contar("gravacoes_falhas", fonte=nome)
+
+
+def transmitir_lotes(lotes, fonte, gravadores, tamanho_lote=TAMANHO_LOTE_GRAVACAO, falhas=None):
+    """Grava as páginas de um iterador de coleta à medida que chegam.
+
+    Páginas são juntadas até `tamanho_lote` registros, o máximo mantido em memória.
+    `gravadores` são funções `(df, fonte)`, como salvar_df_supabase e salvar_snapshot.
+    Devolve o total de registros coletados; gravadores que falharam em algum lote vão para
+    `falhas[fonte]`.
+    """
+    from data.esquemas import aplicar_esquema
+    total = 0
+    pendentes = []
+
+    def descarregar():
+        lote = aplicar_esquema(pd.concat(pendentes, ignore_index=True), fonte)
+        pendentes.clear()
+        falhou = _gravar(lote, fonte, gravadores)
+        if falhas is not None:
+            falhas.setdefault(fonte, set()).update(falhou)
+        if not falhou:
+            logger.info(f"Lote de {len(lote)} registros de {fonte} gravado (total: {total})")
+
+    for pagina in lotes:
+        pendentes.append(pagina)
+        total += len(pagina)
+        if sum(len(p) for p in pendentes) >= tamanho_lote:
+            descarregar()
+    if pendentes:
+        descarregar()
+    return total
+
+
+def coletores_padrao(max_itens=None, usar_cache=True):
+    # Imports tardios: só carrega as bibliotecas das APIs quando há coleta de fato
+    from data.spotify_data import coletar_dados_spotify
+    from data.youtube_data import coletar_dados_youtube
+    from data.google_trends import coletar_dados_trends
+    from data.x_data import coletar_dados_x
+    extras = {"max_itens": max_itens} if max_itens else {}
+    return {
+        "spotify": lambda: coletar_dados_spotify(usar_cache=usar_cache),
+        "youtube": lambda: coletar_dados_youtube(usar_cache=usar_cache, **extras),
+        "trends": lambda: coletar_dados_trends(usar_cache=usar_cache),
+        "twitter": lambda: coletar_dados_x(usar_cache=usar_cache, **extras),
+    }
+
+
+def _treinar_clusters(lote, fonte):
+    from insights.clusterizacao import atualizar_clusters
+    atualizar_clusters(None, lote)
+
+
+def coletores_transmitidos(max_itens, gravadores, usar_cache=True, falhas=None):
+    """YouTube e X paginados até `max_itens`, gravando cada lote assim que chega."""
+    from data.youtube_data import iterar_videos_youtube
+    from data.x_data import iterar_tweets_x
+    # Os clusters aprendem com cada lote de vídeos, como o partial_fit espera
+    gravadores_youtube = gravadores + [_treinar_clusters]
+    return {
+        "youtube": lambda: transmitir_lotes(iterar_videos_youtube(max_itens, usar_cache=usar_cache),
+                                            "youtube", gravadores_youtube, falhas=falhas),
+        "twitter": lambda: transmitir_lotes(iterar_tweets_x(max_itens=max_itens, usar_cache=usar_cache),
+                                            "twitter", gravadores, falhas=falhas),
+    }
+
+
+def _gravadores(destinos, coletado_em=None):
+    gravadores = []
+    if "supabase" in destinos:
+        from data.supabase_manager import salvar_df_supabase
+        gravadores.append(salvar_df_supabase)
+    if "snapshot" in destinos:
+        from data.snapshots import salvar_snapshot
+        gravadores.append(salvar_snapshot)
+    if "sqlite" in destinos:
+        from data.db_manager import salvar_df_em_tabela
+
+        def salvar_sqlite(df, fonte):
+            # Todos os lotes do ciclo com o mesmo instante: carregar_ultima_coleta os lê juntos
+            return salvar_df_em_tabela(df, fonte, coletado_em=coletado_em)
+        gravadores.append(salvar_sqlite)
+    return gravadores
+
+
+def executar_ciclo(fontes=None, destinos=("supabase", "snapshot"), prazos=None, max_itens=None, usar_cache=True):
+    """Uma rodada completa: coleta em paralelo, grava nos destinos e atualiza os clusters.
+
+    Com `max_itens`, YouTube e X são transmitidos: cada lote é gravado assim que chega e
+    a memória não cresce com o orçamento de itens. Fontes coletadas cujo lote não foi
+    gravado em algum destino saem com status "erro_gravacao".
+    """
+    gravadores = _gravadores(destinos, datetime.now(timezone.utc))
+    falhas = {}
+    coletores = coletores_padrao(max_itens, usar_cache)
+    if max_itens:
+        coletores.update(coletores_transmitidos(max_itens, gravadores, usar_cache, falhas))
+    if fontes:
+        coletores = {nome: coletor for nome, coletor in coletores.items() if nome in fontes}
+    dados, status = coletar_fontes(coletores, prazos)
+    for nome, df in dados.items():
+        if not df.empty:
+            falhas.setdefault(nome, set()).update(_gravar(df, nome, gravadores))
+    _marcar_falhas(status, falhas)
+    if "snapshot" in destinos:
+        # Cada ciclo acrescenta partes ao snapshot; junta-as antes que a leitura fique cara
+        from data.snapshots import compactar_se_necessario
+        for nome in status:
+            compactar_se_necessario(nome)
+    if "spotify" in dados or "youtube" in dados:
+        from insights.clusterizacao import atualizar_clusters
+        atualizar_clusters(dados.get("spotify"), dados.get("youtube"))
+    return status
+
+
+def main(argv=None):
+    import argparse
+    import signal
+    from data.limites import agendador
+    from data.instrumentacao import CAMINHO_METRICAS, configurar_logging, exportar_metricas
+
+    parser = argparse.ArgumentParser(description="Coleta headless do Radar Cultural (sem Streamlit).")
+    parser.add_argument("--intervalo", type=float, default=0,
+                        help="segundos entre coletas; 0 executa uma única vez")
+    parser.add_argument("--fontes", nargs="+", choices=["spotify", "youtube", "trends", "twitter"],
+                        help="fontes a coletar (padrão: todas)")
+    parser.add_argument("--destinos", nargs="+", choices=["supabase", "snapshot", "sqlite"],
+                        default=["supabase", "snapshot"], help="onde gravar os dados")
+    parser.add_argument("--prazo", type=float, default=PRAZO_PADRAO, help="prazo por fonte em segundos")
+    parser.add_argument("--max-itens", type=int, default=None, help="itens por fonte paginada (YouTube, X)")
+    parser.add_argument("--sem-cache", action="store_true", help="ignora respostas de API ainda válidas no cache")
+    parser.add_argument("--metricas", default=CAMINHO_METRICAS,
+                        help="arquivo de métricas regravado a cada ciclo (texto do Prometheus; JSON se terminar em .json)")
+    args = parser.parse_args(argv)
+    configurar_logging()
+
+    parado = threading.Event()
+
+    def _encerrar(*_):
+        logger.info("Encerrando coleta agendada")
+        parado.set()
+        agendador.parar()
+
+    signal.signal(signal.SIGTERM, _encerrar)
+    signal.signal(signal.SIGINT, _encerrar)
+
+    fontes = args.fontes or ["spotify", "youtube", "trends", "twitter"]
+    while not parado.is_set():
+        inicio = time.monotonic()
+        status = executar_ciclo(fontes, args.destinos, {nome: args.prazo for nome in fontes}, args.max_itens,
+                                not args.sem_cache)
+        for nome, info in status.items():
+            logger.info(f"{nome}: {info['status']} ({info['registros']} registros, {info['latencia']:.1f}s)")
+        try:
+            exportar_metricas(args.metricas)
+        except OSError as e:
+            logger.error(f"Não foi possível exportar métricas: {str(e)}")
+        if args.intervalo <= 0:
+            break
+        # Intervalo contado do início do ciclo: a cadência não deriva com a duração da coleta
+        parado.wait(max(0.0, args.intervalo - (time.monotonic() - inicio)))
+    return 0 if all(info["status"] in ("ok", "vazio") for info in status.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import logging
+import os
+import tomllib
+
+logger = logging.getLogger(__name__)
+
+# Mesmos arquivos e mesma ordem do st.secrets: o global do usuário e depois o do projeto,
+# que prevalece ([spotify] client_id = ..., etc.)
+ARQUIVOS_PADRAO = [
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+    os.path.join(".streamlit", "secrets.toml"),
+]
+
+_config = None
+
+
+def _carregar_arquivo():
+    global _config
+    if _config is None:
+        # RADAR_CONFIG aceita um ou mais caminhos separados por os.pathsep
+        caminhos = os.environ["RADAR_CONFIG"].split(os.pathsep) if os.environ.get("RADAR_CONFIG") else ARQUIVOS_PADRAO
+        config = {}
+        for caminho in caminhos:
+            try:
+                with open(caminho, "rb") as arquivo:
+                    dados = tomllib.load(arquivo)
+            except FileNotFoundError:
+                continue
+            # Atualização rasa, como o st.secrets: uma seção do projeto substitui a global inteira
+            config.update(dados)
+            logger.info(f"Credenciais lidas de {caminho}")
+        if not config:
+            logger.info(f"Nenhum arquivo de credenciais em {caminhos}; usando só variáveis de ambiente")
+        _config = config
+    return _config
+
+
+def obter_credencial(servico, chave):
+    """Lê `servico.chave` da variável de ambiente SERVICO_CHAVE ou do arquivo de configuração.
+
+    Os arquivos são RADAR_CONFIG ou, por padrão, ~/.streamlit/secrets.toml e
+    .streamlit/secrets.toml, como no st.secrets; nada aqui importa o Streamlit.
+    """
+    valor = os.environ.get(f"{servico}_{chave}".upper())
+    if valor:
+        return valor
+    try:
+        return _carregar_arquivo()[servico][chave]
+    except KeyError:
+        raise KeyError(f"Credencial ausente: {servico}.{chave} (defina {f'{servico}_{chave}'.upper()} ou o arquivo de configuração)")
+
+
+def tem_credenciais(servico, *chaves):
+    try:
+        for chave in chaves:
+            obter_credencial(servico, chave)
+        return True
+    except KeyError:
+        return False
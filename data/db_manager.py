@@ -1,39 +1,148 @@
+import re
 import sqlite3
+import threading
+from datetime import datetime, timezone
+import logging
 import pandas as pd
-import streamlit as st
+from data.esquemas import CHAVES_NATURAIS, aplicar_esquema
+from data.instrumentacao import contar, medir
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = "database.db"
 
+# Cada linha guarda o instante da coleta; as tabelas só recebem INSERT
+COLUNA_TEMPO = "coletado_em"
+
+_NOME_VALIDO = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_conexao = None
+_lock = threading.RLock()
+
 def conectar_db():
-    return sqlite3.connect(DB_PATH)
+    # Uma conexão por processo, compartilhada entre reruns e protegida por lock
+    global _conexao
+    with _lock:
+        if _conexao is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            _conexao = conn
+        return _conexao
+
+def _identificador(nome):
+    if not _NOME_VALIDO.match(nome):
+        raise ValueError(f"Nome inválido: {nome!r}")
+    return f'"{nome}"'
+
+def _tipo_sqlite(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
 
-def salvar_df_em_tabela(df, nome_tabela):
+def _instante(valor):
+    # ISO-8601 em UTC com precisão fixa: a ordem lexicográfica é a ordem temporal
+    ts = pd.Timestamp(valor)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return ts.to_pydatetime().isoformat(timespec="seconds")
+
+def _colunas_existentes(conn, nome_tabela):
+    return [linha[1] for linha in conn.execute(f"PRAGMA table_info({_identificador(nome_tabela)})")]
+
+def _garantir_tabela(conn, nome_tabela, df):
+    tabela = _identificador(nome_tabela)
+    colunas = {col: _tipo_sqlite(df[col].dtype) for col in df.columns if col != COLUNA_TEMPO}
+    definicoes = ", ".join(f"{_identificador(col)} {tipo}" for col, tipo in colunas.items())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {tabela} ({COLUNA_TEMPO} TEXT NOT NULL{', ' + definicoes if definicoes else ''})")
+    # Coletas novas podem trazer colunas novas (tabelas antigas também não têm coletado_em)
+    existentes = set(_colunas_existentes(conn, nome_tabela))
+    for col in [COLUNA_TEMPO] + list(colunas):
+        if col not in existentes:
+            conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {_identificador(col)} {colunas.get(col, 'TEXT')}")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {_identificador('idx_' + nome_tabela + '_tempo')} ON {tabela} ({COLUNA_TEMPO})")
+    chaves = [c for c in CHAVES_NATURAIS.get(nome_tabela, []) if c in existentes or c in colunas]
+    if chaves:
+        indice = ", ".join(_identificador(c) for c in chaves + [COLUNA_TEMPO])
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {_identificador('idx_' + nome_tabela + '_chave')} ON {tabela} ({indice})")
+        # Visão com a versão mais recente de cada item
+        grupo = ", ".join(_identificador(c) for c in chaves)
+        conn.execute(
+            f"CREATE VIEW IF NOT EXISTS {_identificador(nome_tabela + '_atual')} AS "
+            f"SELECT * FROM {tabela} WHERE rowid IN (SELECT MAX(rowid) FROM {tabela} GROUP BY {grupo})"
+        )
+
+def salvar_df_em_tabela(df, nome_tabela, coletado_em=None):
+    """Acrescenta `df` a `nome_tabela` com o instante da coleta, em uma única transação."""
     try:
         conn = conectar_db()
-        df.to_sql(nome_tabela, conn, if_exists="replace", index=False)
-        st.success(f"Tabela '{nome_tabela}' salva com sucesso.")
+        instante = _instante(coletado_em or datetime.now(timezone.utc))
+        df = df.drop(columns=[COLUNA_TEMPO], errors="ignore")
+        valores = df.copy()
+        for col in valores.columns:
+            if pd.api.types.is_datetime64_any_dtype(valores[col]):
+                valores[col] = valores[col].map(lambda v: v.isoformat() if pd.notna(v) else None)
+        valores = valores.astype(object).where(valores.notna(), None)
+        colunas = ", ".join(_identificador(c) for c in [COLUNA_TEMPO] + list(df.columns))
+        marcadores = ", ".join("?" * (len(df.columns) + 1))
+        linhas = ((instante, *linha) for linha in valores.itertuples(index=False, name=None))
+        with medir("armazenamento", destino="sqlite", operacao="gravar", tabela=nome_tabela), _lock, conn:
+            _garantir_tabela(conn, nome_tabela, df)
+            conn.executemany(f"INSERT INTO {_identificador(nome_tabela)} ({colunas}) VALUES ({marcadores})", linhas)
+        contar("registros_gravados", len(df), destino="sqlite", tabela=nome_tabela)
+        logger.info(f"Tabela '{nome_tabela}' salva com sucesso: {len(df)} registros")
+        return True
     except Exception as e:
-        st.error(f"Erro ao salvar tabela '{nome_tabela}': {e}")
-    finally:
-        conn.close()
+        logger.error(f"Erro ao salvar tabela '{nome_tabela}': {e}")
+        return False
 
-def carregar_tabela(nome_tabela):
+def _consultar(nome_tabela, colunas=None, onde="", parametros=()):
     conn = conectar_db()
-    try:
+    with _lock:
         # Verifica se a tabela existe
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name=?;",
+        cursor = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name=?;",
             (nome_tabela,)
         )
         if not cursor.fetchone():
-            st.warning(f"A tabela '{nome_tabela}' ainda não foi criada.")
+            logger.warning(f"A tabela '{nome_tabela}' ainda não foi criada.")
             return pd.DataFrame()
+        selecao = ", ".join(_identificador(c) for c in colunas) if colunas else "*"
+        with medir("armazenamento", destino="sqlite", operacao="ler", tabela=nome_tabela):
+            df = pd.read_sql(f"SELECT {selecao} FROM {_identificador(nome_tabela)} {onde}", conn, params=parametros)
+        contar("registros_lidos", len(df), destino="sqlite", tabela=nome_tabela)
+        # Datas voltam do SQLite como texto; o esquema da fonte as restaura (a visão "<fonte>_atual" inclusive)
+        return aplicar_esquema(df, nome_tabela.removesuffix("_atual"))
 
-        df = pd.read_sql(f"SELECT * FROM {nome_tabela}", conn)
-        return df
+def carregar_tabela(nome_tabela, colunas=None):
+    try:
+        return _consultar(nome_tabela, colunas)
+    except Exception as e:
+        logger.error(f"Erro ao carregar a tabela '{nome_tabela}': {e}")
+        return pd.DataFrame()
+
+def carregar_janela(nome_tabela, inicio, fim=None, colunas=None):
+    """Linhas coletadas em [inicio, fim); sem `fim`, até agora."""
+    try:
+        onde = f"WHERE {COLUNA_TEMPO} >= ?"
+        parametros = [_instante(inicio)]
+        if fim is not None:
+            onde += f" AND {COLUNA_TEMPO} < ?"
+            parametros.append(_instante(fim))
+        return _consultar(nome_tabela, colunas, onde + f" ORDER BY {COLUNA_TEMPO}", parametros)
     except Exception as e:
-        st.error(f"Erro ao carregar a tabela '{nome_tabela}': {e}")
+        logger.error(f"Erro ao carregar a tabela '{nome_tabela}': {e}")
         return pd.DataFrame()
-    finally:
-        conn.close()
+
+def carregar_ultima_coleta(nome_tabela, colunas=None):
+    """Somente as linhas da coleta mais recente."""
+    try:
+        tabela = _identificador(nome_tabela)
+        return _consultar(nome_tabela, colunas, f"WHERE {COLUNA_TEMPO} = (SELECT MAX({COLUNA_TEMPO}) FROM {tabela})")
+    except Exception as e:
+        logger.error(f"Erro ao carregar a tabela '{nome_tabela}': {e}")
+        return pd.DataFrame()
+
+def carregar_estado_atual(nome_tabela, colunas=None):
+    """Versão mais recente de cada item (pela chave natural da fonte)."""
+    return carregar_tabela(f"{nome_tabela}_atual", colunas)
@@ -0,0 +1,49 @@
+-- Restrições únicas usadas pelo upsert de salvar_df_supabase (ver data/esquemas.CHAVES_NATURAIS).
+-- Antes do upsert as gravações só acrescentavam linhas: as repetidas da chave saem antes da
+-- restrição, ficando a inserida por último (maior ctid). O script pode ser rodado de novo.
+alter table twitter add column if not exists id text;
+alter table trends add column if not exists data date;
+
+delete from spotify a using spotify b where a.ctid < b.ctid and a.nome = b.nome and a.artista = b.artista;
+delete from youtube a using youtube b where a.ctid < b.ctid and a.titulo = b.titulo and a.canal = b.canal;
+delete from twitter a using twitter b where a.ctid < b.ctid and a.id = b.id;
+delete from trends a using trends b where a.ctid < b.ctid and a.termo = b.termo and a.data = b.data;
+
+do $$
+begin
+  if not exists (select 1 from pg_constraint where conname = 'spotify_chave_natural') then
+    alter table spotify add constraint spotify_chave_natural unique (nome, artista);
+  end if;
+  if not exists (select 1 from pg_constraint where conname = 'youtube_chave_natural') then
+    alter table youtube add constraint youtube_chave_natural unique (titulo, canal);
+  end if;
+  if not exists (select 1 from pg_constraint where conname = 'twitter_chave_natural') then
+    alter table twitter add constraint twitter_chave_natural unique (id);
+  end if;
+  if not exists (select 1 from pg_constraint where conname = 'trends_chave_natural') then
+    alter table trends add constraint trends_chave_natural unique (termo, data);
+  end if;
+end $$;
+
+-- Marca d'água das leituras incrementais (supabase_manager.carregar_df_supabase_incremental).
+-- O default cobre inserts; o gatilho avança a coluna a cada update, inclusive nos upserts
+-- (ON CONFLICT DO UPDATE dispara gatilhos BEFORE UPDATE). clock_timestamp() em vez de now()
+-- para que as linhas de um mesmo lote não empatem.
+create or replace function marcar_atualizacao() returns trigger language plpgsql as $$
+begin
+  new.atualizado_em := clock_timestamp();
+  return new;
+end $$;
+
+alter table spotify add column if not exists atualizado_em timestamptz not null default clock_timestamp();
+alter table youtube add column if not exists atualizado_em timestamptz not null default clock_timestamp();
+alter table twitter add column if not exists atualizado_em timestamptz not null default clock_timestamp();
+alter table trends add column if not exists atualizado_em timestamptz not null default clock_timestamp();
+create index if not exists spotify_atualizado_em on spotify (atualizado_em);
+create index if not exists youtube_atualizado_em on youtube (atualizado_em);
+create index if not exists twitter_atualizado_em on twitter (atualizado_em);
+create index if not exists trends_atualizado_em on trends (atualizado_em);
+create or replace trigger spotify_atualizado_em before update on spotify for each row execute function marcar_atualizacao();
+create or replace trigger youtube_atualizado_em before update on youtube for each row execute function marcar_atualizacao();
+create or replace trigger twitter_atualizado_em before update on twitter for each row execute function marcar_atualizacao();
+create or replace trigger trends_atualizado_em before update on trends for each row execute function marcar_atualizacao();
@@ -0,0 +1,129 @@
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Chave natural de cada fonte: identifica o mesmo item entre coletas
+CHAVES_NATURAIS = {
+    "spotify": ["nome", "artista"],
+    "youtube": ["titulo", "canal"],
+    "twitter": ["id"],
+    "trends": ["termo", "data"],
+}
+
+# Colunas e dtypes compactos de cada fonte: texto em Arrow, categorias para valores muito
+# repetidos (artistas, canais), contadores inteiros de largura fixa, instantes com fuso e
+# datas de calendário (trends.data é `date` no Postgres, ver esquema_supabase.sql)
+ESQUEMAS = {
+    "spotify": {"nome": "string[pyarrow]", "artista": "category", "popularidade": "int32"},
+    "youtube": {"titulo": "string[pyarrow]", "canal": "category", "visualizacoes": "uint64", "likes": "uint64"},
+    "trends": {"termo": "string[pyarrow]", "data": "date32[pyarrow]"},
+    "twitter": {"id": "string[pyarrow]", "assunto": "string[pyarrow]", "volume": "uint64",
+                "created_at": "datetime64[ns, UTC]"},
+}
+
+# Sem estas colunas a fonte não alimenta visualizações nem análises
+COLUNAS_OBRIGATORIAS = {
+    "spotify": ["nome", "artista", "popularidade"],
+    "youtube": ["titulo", "canal", "visualizacoes"],
+    "trends": ["termo"],
+    "twitter": ["assunto", "volume", "created_at"],
+}
+
+
+def colunas(fonte):
+    return list(ESQUEMAS.get(fonte, {}))
+
+
+def deduplicar(df, fonte):
+    """Mantém a última ocorrência de cada chave natural; linhas sem chave (dados antigos) ficam todas."""
+    chaves = [c for c in CHAVES_NATURAIS.get(fonte, []) if c in df.columns]
+    if not chaves or df.empty:
+        return df
+    com_chave = df[chaves].notna().all(axis=1)
+    return df[~(com_chave & df.duplicated(subset=chaves, keep="last"))]
+
+
+def _tipos_conferem(df, esquema):
+    # Barato (só compara dtypes): pega DataFrames derivados cujo attrs veio junto mas os tipos não,
+    # como o concat de lotes categóricos com categorias diferentes
+    return all(df[c].dtype == pd.api.types.pandas_dtype(t) for c, t in esquema.items() if c in df.columns)
+
+
+def _converter(serie, dtype):
+    """Devolve a série no dtype do esquema e quantos valores não puderam ser convertidos."""
+    if serie.dtype == pd.api.types.pandas_dtype(dtype):
+        return serie, 0
+    if dtype.startswith("datetime64"):
+        convertida = pd.to_datetime(serie, utc=True, errors="coerce").astype(dtype)
+    elif dtype.startswith("date32"):
+        # Texto ISO (Supabase, SQLite, snapshots antigos) ou instantes: fica só o dia
+        convertida = pd.to_datetime(serie, errors="coerce", format="ISO8601").dt.date.astype(dtype)
+    elif dtype == "category" or dtype.startswith("string"):
+        return serie.astype(dtype), 0
+    else:
+        # Contadores: ausentes e inválidos viram 0, como nas análises; negativos não existem
+        convertida = pd.to_numeric(serie, errors="coerce")
+        invalidos = int(convertida.isna().sum() - serie.isna().sum())
+        if dtype.startswith("u"):
+            convertida = convertida.clip(lower=0)
+        return convertida.fillna(0).astype(dtype), invalidos
+    return convertida, int(convertida.isna().sum() - serie.isna().sum())
+
+
+def aplicar_esquema(df, fonte):
+    """Converte `df` para os dtypes de `fonte` e o valida uma única vez.
+
+    O resultado fica em `df.attrs["esquema"]`, que sobrevive a cópias, fatias e ao cache
+    do Streamlit: DataFrames já convertidos voltam sem nenhum trabalho. Colunas fora do
+    esquema são mantidas como estão.
+    """
+    esquema = ESQUEMAS.get(fonte)
+    if esquema is None or not isinstance(df, pd.DataFrame):
+        return df
+    faltando = [c for c in COLUNAS_OBRIGATORIAS.get(fonte, []) if c not in df.columns]
+    # Uma projeção herda attrs da tabela validada: sem as colunas obrigatórias, valida de novo
+    if df.attrs.get("esquema", {}).get("fonte") == fonte and _tipos_conferem(df, esquema) and not faltando:
+        return df
+    df = df.copy(deep=False)
+    problemas = []
+    if faltando:
+        problemas.append(f"faltam colunas {faltando}")
+    if df.empty:
+        problemas.append("sem registros")
+    for coluna, dtype in esquema.items():
+        if coluna in df.columns:
+            df[coluna], invalidos = _converter(df[coluna], dtype)
+            if invalidos:
+                problemas.append(f"{invalidos} valores inválidos em {coluna}")
+    df.attrs["esquema"] = {"fonte": fonte, "valido": not faltando and not df.empty, "problemas": problemas}
+    if problemas:
+        logger.warning(f"Dados de {fonte}: {'; '.join(problemas)}")
+    return df
+
+
+def marcar_versao(df, versao):
+    """Anota em `df.attrs` uma versão barata dos dados, usada como chave de cache no lugar do conteúdo.
+
+    A anotação acompanha cópias e o cache do Streamlit; só vale enquanto o DataFrame tiver
+    as mesmas linhas e colunas, por isso elas são registradas junto (ver versao_marcada).
+    """
+    df.attrs["versao"] = {"id": versao, "linhas": len(df), "colunas": list(df.columns)}
+    return df
+
+
+def versao_marcada(df, colunas=None):
+    """Versão anotada por marcar_versao restrita a `colunas`, ou None se não houver ou não valer mais."""
+    versao = df.attrs.get("versao")
+    colunas = list(df.columns) if colunas is None else [c for c in colunas if c in df.columns]
+    # Frames derivados herdam attrs: um filtro muda o número de linhas, um assign traz coluna nova
+    if not versao or versao["linhas"] != len(df) or not set(colunas) <= set(versao["colunas"]):
+        return None
+    return f"{versao['id']}:{','.join(colunas)}"
+
+
+def esquema_valido(df, fonte):
+    """Resultado da validação feita na ingestão (valida agora só o que não passou por aplicar_esquema)."""
+    if not isinstance(df, pd.DataFrame) or df.empty:
+        return False
+    return aplicar_esquema(df, fonte).attrs.get("esquema", {}).get("valido", True)
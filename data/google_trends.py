@@ -1,42 +1,49 @@
 import pandas as pd
 import logging
 import json
-from pytrends.request import TrendReq
-import time
-import streamlit as st
+from data.clientes import cliente_trends
+from data.limites import agendador
+from data.cache_respostas import cache
+from data.esquemas import aplicar_esquema
+from data.reducao import MAX_PONTOS, lttb
+from datetime import date
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def coletar_dados_trends(max_retries=3):
+def coletar_dados_trends(max_retries=3, usar_cache=True):
     try:
-        pytrends = TrendReq(hl='pt-BR', tz=360)
+        pytrends = cliente_trends()
         
-        for attempt in range(1, max_retries + 1):
-            try:
-                logger.info(f"Tentativa {attempt}/{max_retries} de coletar tendências do Google Trends para o Brasil")
-                trending_df = pytrends.trending_searches(pn="brazil")
-                trending_df.columns = ["termo"]
-                if not trending_df.empty:
-                    logger.info(f"Dados coletados: {len(trending_df)} termos")
-                    st.session_state["trends_data"] = trending_df
-                    return trending_df
-            except Exception as e:
-                logger.error(f"Tentativa {attempt} falhou: {str(e)}")
-                if attempt < max_retries:
-                    time.sleep(2 ** attempt)
-                continue
+        try:
+            logger.info("Coletando tendências do Google Trends para o Brasil")
+            trending_df = cache.obter_ou_calcular(
+                "trends", "trending_searches", {"pn": "brazil"},
+                lambda: agendador.executar("trends", pytrends.trending_searches, pn="brazil", max_tentativas=max_retries),
+                forcar=not usar_cache,
+            ).copy()
+            trending_df.columns = ["termo"]
+            trending_df["data"] = date.today()
+            trending_df = aplicar_esquema(trending_df, "trends")
+            if not trending_df.empty:
+                logger.info(f"Dados coletados: {len(trending_df)} termos")
+                return trending_df
+        except Exception as e:
+            logger.error(f"Coleta de tendências falhou: {str(e)}")
 
         logger.info("Tentando fallback com interest_over_time")
         keywords = ["música", "cultura", "tendências"]
-        pytrends.build_payload(kw_list=keywords, timeframe='now 7-d', geo='BR')
-        df = pytrends.interest_over_time()
+        params = {"kw_list": keywords, "timeframe": 'now 7-d', "geo": 'BR'}
+
+        def interesse():
+            agendador.executar("trends", pytrends.build_payload, **params)
+            return agendador.executar("trends", pytrends.interest_over_time)
+
+        df = cache.obter_ou_calcular("trends", "interest_over_time", params, interesse, forcar=not usar_cache).copy()
         if not df.empty:
             if 'isPartial' in df.columns:
                 df = df.drop(columns=['isPartial'])
             df = df.reset_index()
             logger.info(f"Dados via interest_over_time: {len(df)} registros")
-            st.session_state["trends_data"] = df
             return df
         logger.warning("Nenhum dado retornado")
         return pd.DataFrame()
@@ -44,12 +51,17 @@ def coletar_dados_trends(max_retries=3):
         logger.error(f"Falha na coleta: {str(e)}")
         return pd.DataFrame()
 
-@st.cache_data
-def generate_chart_config(df):
+def generate_chart_config(df, max_pontos=MAX_PONTOS):
     if df.empty or 'date' not in df.columns:
         logger.error("DataFrame vazio ou sem 'date'.")
         return None
-    labels = df['date'].dt.strftime('%Y-%m-%d').tolist()
+    # Reduz as linhas com LTTB antes de serializar; o máximo entre as séries guia a escolha
+    # para que o pico de qualquer termo sobreviva
+    df = df.sort_values('date')
+    valores = df.drop(columns='date').select_dtypes('number')
+    if len(df) > max_pontos and not valores.empty:
+        df = df.iloc[lttb(df['date'].astype('int64').to_numpy(), valores.max(axis=1).to_numpy(), max_pontos)]
+    labels = df['date'].dt.strftime('%Y-%m-%d').to_numpy().tolist()
     colors = [
         {"border": "#FF6384", "background": "rgba(255, 99, 132, 0.2)"},
         {"border": "#36A2EB", "background": "rgba(54, 162, 235, 0.2)"},
@@ -58,7 +70,7 @@ def generate_chart_config(df):
     datasets = [
         {
             "label": col,
-            "data": df[col].tolist(),
+            "data": df[col].to_numpy().tolist(),
             "borderColor": colors[i % len(colors)]["border"],
             "backgroundColor": colors[i % len(colors)]["background"],
             "fill": False
@@ -79,11 +91,12 @@ def generate_chart_config(df):
     return chart_config
 
 if __name__ == "__main__":
+    from data.instrumentacao import configurar_logging
+    configurar_logging()
     df = coletar_dados_trends()
     if not df.empty:
-        st.write("Dados coletados:")
-        st.dataframe(df.head())
+        print(df.head())
         chart_config = generate_chart_config(df)
         if chart_config:
-            st.json(chart_config)
+            print(json.dumps(chart_config, ensure_ascii=False, indent=2, default=str))
             logger.info("Gráfico configurado")
@@ -0,0 +1,187 @@
+"""Instrumentação do pipeline: tempos por etapa, contadores, logs em memória e exportação.
+
+Etapas são medidas com `medir("coleta", fonte="x")` (context manager) e contadores com
+`contar("registros", 120, fonte="x")`. `exportar_metricas()` grava tudo em formato texto
+do Prometheus (ou JSON, se o arquivo terminar em .json) para um coletor externo.
+"""
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+FORMATO_LOG = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+MAX_LINHAS_LOG = 2000
+PREFIXO = "radar"
+CAMINHO_METRICAS = os.environ.get("RADAR_METRICAS", os.path.join("metricas", "radar.prom"))
+# Limites (segundos) dos baldes do histograma de duração das etapas
+BALDES_SEGUNDOS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+
+
+class BufferLogs(logging.Handler):
+    """Guarda as últimas `capacidade` linhas de log formatadas; as mais antigas são descartadas."""
+
+    def __init__(self, capacidade=MAX_LINHAS_LOG):
+        super().__init__()
+        self._linhas = deque(maxlen=capacidade)
+        self.setFormatter(logging.Formatter(FORMATO_LOG))
+
+    def emit(self, registro):
+        try:
+            self._linhas.append((registro.levelno, self.format(registro)))
+        except Exception:
+            self.handleError(registro)
+
+    def linhas(self, nivel=logging.NOTSET, ultimas=None):
+        selecionadas = [linha for nivel_linha, linha in list(self._linhas) if nivel_linha >= nivel]
+        return selecionadas[-ultimas:] if ultimas else selecionadas
+
+    def texto(self, nivel=logging.NOTSET, ultimas=None):
+        return "\n".join(self.linhas(nivel, ultimas)) or "(nenhum log registrado)"
+
+    def limpar(self):
+        self._linhas.clear()
+
+
+# Buffer único do processo, exibido pelo dashboard
+buffer_logs = BufferLogs()
+
+
+def configurar_logging(nivel=logging.INFO):
+    """Configura o logger raiz uma única vez: saída de erro padrão + buffer em memória.
+
+    Só pontos de entrada (dashboard, coleta headless, benchmarks) chamam esta função;
+    os módulos apenas criam o próprio logger.
+    """
+    raiz = logging.getLogger()
+    raiz.setLevel(nivel)
+    if buffer_logs not in raiz.handlers:
+        if not any(isinstance(h, logging.StreamHandler) and not isinstance(h, BufferLogs) for h in raiz.handlers):
+            saida = logging.StreamHandler(sys.stderr)
+            saida.setFormatter(logging.Formatter(FORMATO_LOG))
+            raiz.addHandler(saida)
+        raiz.addHandler(buffer_logs)
+    return buffer_logs
+
+
+def _rotulos_prometheus(pares):
+    if not pares:
+        return ""
+    escapar = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")  # noqa: E731
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in pares) + "}"
+
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+
+
+class Metricas:
+    """Contadores e histogramas de duração com rótulos, seguros entre threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._duracoes = {}
+
+    def contar(self, nome, valor=1, **rotulos):
+        chave = _chave(nome, rotulos)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, etapa, segundos, **rotulos):
+        chave = _chave(etapa, rotulos)
+        with self._lock:
+            serie = self._duracoes.get(chave)
+            if serie is None:
+                serie = self._duracoes[chave] = {"contagem": 0, "soma": 0.0, "maximo": 0.0,
+                                                 "ultima": 0.0, "baldes": [0] * len(BALDES_SEGUNDOS)}
+            serie["contagem"] += 1
+            serie["soma"] += segundos
+            serie["maximo"] = max(serie["maximo"], segundos)
+            serie["ultima"] = segundos
+            for i, limite in enumerate(BALDES_SEGUNDOS):
+                if segundos <= limite:
+                    serie["baldes"][i] += 1
+
+    @contextmanager
+    def medir(self, etapa, **rotulos):
+        """Mede o bloco como uma etapa; exceções contam em `erros` e são propagadas."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.contar("erros", etapa=etapa, **rotulos)
+            raise
+        finally:
+            self.observar(etapa, time.perf_counter() - inicio, **rotulos)
+
+    def etapas(self):
+        """Uma linha por etapa/rótulos com contagem, total, média, máximo e última duração."""
+        with self._lock:
+            return [
+                {"etapa": nome, **dict(rotulos), "contagem": s["contagem"], "total_s": round(s["soma"], 4),
+                 "media_s": round(s["soma"] / s["contagem"], 4), "maximo_s": round(s["maximo"], 4),
+                 "ultima_s": round(s["ultima"], 4)}
+                for (nome, rotulos), s in self._duracoes.items()
+            ]
+
+    def contadores(self):
+        with self._lock:
+            return [{"contador": nome, **dict(rotulos), "valor": valor}
+                    for (nome, rotulos), valor in self._contadores.items()]
+
+    def json(self):
+        return json.dumps({"gerado_em": time.time(), "etapas": self.etapas(), "contadores": self.contadores()},
+                          ensure_ascii=False, indent=2)
+
+    def prometheus(self):
+        """Formato de exposição texto do Prometheus (contadores e um histograma por etapa)."""
+        linhas = []
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            duracoes = sorted(self._duracoes.items())
+        for nome in sorted({nome for (nome, _), _ in contadores}):
+            linhas.append(f"# TYPE {PREFIXO}_{nome}_total counter")
+            for (outro, pares), valor in contadores:
+                if outro == nome:
+                    linhas.append(f"{PREFIXO}_{nome}_total{_rotulos_prometheus(pares)} {valor}")
+        if duracoes:
+            metrica = f"{PREFIXO}_etapa_duracao_segundos"
+            linhas.append(f"# TYPE {metrica} histogram")
+            for (etapa, pares), serie in duracoes:
+                pares = (("etapa", etapa),) + pares
+                for limite, quantidade in zip(BALDES_SEGUNDOS, serie["baldes"]):
+                    le = "+Inf" if math.isinf(limite) else repr(float(limite))
+                    linhas.append(f"{metrica}_bucket{_rotulos_prometheus(pares + (('le', le),))} {quantidade}")
+                linhas.append(f"{metrica}_sum{_rotulos_prometheus(pares)} {serie['soma']:.6f}")
+                linhas.append(f"{metrica}_count{_rotulos_prometheus(pares)} {serie['contagem']}")
+        return "\n".join(linhas) + "\n"
+
+    def exportar(self, caminho=CAMINHO_METRICAS):
+        """Grava as métricas em `caminho` de forma atômica (JSON se terminar em .json)."""
+        conteudo = self.json() if caminho.endswith(".json") else self.prometheus()
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, caminho)
+        logger.info(f"Métricas exportadas para {caminho}")
+        return caminho
+
+    def zerar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._duracoes.clear()
+
+
+# Instância única do processo, compartilhada por coletores, armazenamento, análises e dashboard
+metricas = Metricas()
+medir = metricas.medir
+contar = metricas.contar
+exportar_metricas = metricas.exportar
@@ -0,0 +1,232 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from data.instrumentacao import contar, medir
+
+logger = logging.getLogger(__name__)
+
+# capacidade/taxa: balde de tokens (rajada e chamadas por segundo)
+# cota/janela: orçamento do provedor em unidades por janela de segundos (None = sem cota conhecida)
+# fuso: a janela diária vira à meia-noite desse fuso, como no provedor; sem ele, a janela
+# começa na primeira chamada
+LIMITES_PADRAO = {
+    "youtube": {"capacidade": 10, "taxa": 5.0, "cota": 10000, "janela": 86400,   # 10 mil unidades/dia,
+                "fuso": "America/Los_Angeles"},                                  # zeradas à meia-noite do Pacífico
+    "x": {"capacidade": 5, "taxa": 450 / 900, "cota": 450, "janela": 900},       # 450 buscas/15 min (app)
+    "spotify": {"capacidade": 10, "taxa": 3.0, "cota": None, "janela": None},    # janela móvel de 30 s
+    "trends": {"capacidade": 1, "taxa": 0.2, "cota": None, "janela": None},      # API não oficial: conservador
+}
+
+# Respostas que não adianta repetir (credencial, parâmetro ou recurso inválidos)
+STATUS_SEM_RETRY = {400, 401, 404}
+
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+class CotaEsgotada(Exception):
+    def __init__(self, servico, reinicia_em):
+        super().__init__(f"Cota de {servico} esgotada; reinicia em {max(0.0, reinicia_em - time.time()):.0f}s")
+        self.servico = servico
+        self.reinicia_em = reinicia_em
+
+
+class BaldeTokens:
+    def __init__(self, capacidade, taxa):
+        self.capacidade = capacidade
+        self.taxa = taxa
+        self.tokens = float(capacidade)
+        self.ultimo = time.monotonic()
+
+    def reservar(self, custo=1):
+        """Consome `custo` tokens e devolve 0, ou devolve quantos segundos faltam para haver saldo."""
+        agora = time.monotonic()
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.ultimo) * self.taxa)
+        self.ultimo = agora
+        if self.tokens >= custo:
+            self.tokens -= custo
+            return 0.0
+        return (custo - self.tokens) / self.taxa
+
+
+def _janela(config, agora):
+    """(início, fim) em epoch da janela de cota que contém `agora`."""
+    if config.get("fuso"):
+        fuso = ZoneInfo(config["fuso"])
+        inicio = datetime.fromtimestamp(agora, fuso).replace(hour=0, minute=0, second=0, microsecond=0)
+        # Aritmética de relógio: a próxima meia-noite local, com 23 ou 25 h nos dias de horário de verão
+        return inicio.timestamp(), (inicio + timedelta(days=1)).timestamp()
+    return agora, agora + config["janela"]
+
+
+def _status_http(erro):
+    # Cada biblioteca guarda o status num lugar diferente
+    for obter in (lambda e: e.response.status_code,   # tweepy, pytrends, requests
+                  lambda e: e.http_status,            # spotipy
+                  lambda e: e.resp.status,            # googleapiclient
+                  lambda e: e.status_code):
+        try:
+            return int(obter(erro))
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return None
+
+
+def _cabecalhos(erro):
+    for obter in (lambda e: e.response.headers, lambda e: e.headers, lambda e: e.resp):
+        try:
+            cabecalhos = obter(erro)
+        except AttributeError:
+            continue
+        if cabecalhos:
+            return {str(k).lower(): v for k, v in dict(cabecalhos).items()}
+    return {}
+
+
+def _espera_sugerida(erro):
+    """Segundos de espera indicados pelo servidor (Retry-After ou x-rate-limit-reset), se houver."""
+    cabecalhos = _cabecalhos(erro)
+    try:
+        if "retry-after" in cabecalhos:
+            return max(0.0, float(cabecalhos["retry-after"]))
+        if "x-rate-limit-reset" in cabecalhos:
+            return max(0.0, float(cabecalhos["x-rate-limit-reset"]) - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _cota_excedida(erro, status):
+    # YouTube sinaliza cota diária esgotada com 403 quotaExceeded
+    return status == 403 and "quota" in str(erro).lower()
+
+
+class AgendadorLimites:
+    """Balde de tokens e contabilidade de cota por serviço, compartilhados por todos os coletores.
+
+    As esperas usam Event.wait fora do lock: só a thread do serviço limitado espera,
+    as coletas das outras fontes seguem normalmente.
+    """
+
+    def __init__(self, limites=None):
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._servicos = {}
+        for servico, config in (limites or LIMITES_PADRAO).items():
+            inicio, fim = _janela(config, time.time()) if config["janela"] else (None, None)
+            self._servicos[servico] = {
+                "balde": BaldeTokens(config["capacidade"], config["taxa"]),
+                "config": config,
+                "cota": config["cota"],
+                "janela": config["janela"],
+                "usado": 0,
+                "inicio_janela": inicio,
+                "fim_janela": fim,
+                "bloqueado_ate": 0.0,
+                "chamadas": 0,
+                "falhas": 0,
+                "limitadas": 0,
+            }
+
+    def _estado(self, servico):
+        if servico not in self._servicos:
+            raise KeyError(f"Serviço sem limites configurados: {servico}")
+        return self._servicos[servico]
+
+    def _reservar(self, servico, custo):
+        # Devolve quantos segundos esperar antes de chamar (0 = pode chamar agora)
+        with self._lock:
+            estado = self._estado(servico)
+            agora = time.time()
+            if estado["janela"] and agora >= estado["fim_janela"]:
+                estado["usado"] = 0
+                estado["inicio_janela"], estado["fim_janela"] = _janela(estado["config"], agora)
+            if estado["bloqueado_ate"] > agora:
+                return estado["bloqueado_ate"] - agora
+            if estado["cota"] is not None and estado["usado"] + custo > estado["cota"]:
+                raise CotaEsgotada(servico, estado["fim_janela"])
+            espera = estado["balde"].reservar(custo)
+            if espera == 0:
+                estado["usado"] += custo
+                estado["chamadas"] += 1
+            return espera
+
+    def aguardar(self, segundos):
+        # Espera interrompível; não segura nenhum lock
+        return not self._parar.wait(segundos)
+
+    def parar(self):
+        self._parar.set()
+
+    def executar(self, servico, funcao, *args, custo=1, max_tentativas=3, espera_maxima=BACKOFF_MAX, **kwargs):
+        """Chama `funcao(*args, **kwargs)` respeitando o limite de `servico`, com retry e backoff."""
+        for tentativa in range(1, max_tentativas + 1):
+            espera = self._reservar(servico, custo)
+            while espera > 0:
+                if espera > espera_maxima:
+                    raise CotaEsgotada(servico, time.time() + espera)
+                contar("esperas_limite", servico=servico)
+                with medir("espera_limite", servico=servico):
+                    if not self.aguardar(espera):
+                        raise RuntimeError("Agendador interrompido")
+                espera = self._reservar(servico, custo)
+            contar("chamadas_api", servico=servico)
+            try:
+                with medir("api", servico=servico):
+                    return funcao(*args, **kwargs)
+            except Exception as e:
+                status = _status_http(e)
+                sugerida = _espera_sugerida(e)
+                contar("falhas_api", servico=servico, status=status or "desconhecido")
+                with self._lock:
+                    estado = self._estado(servico)
+                    estado["falhas"] += 1
+                    if status == 429 or _cota_excedida(e, status):
+                        estado["limitadas"] += 1
+                        if _cota_excedida(e, status) and estado["cota"] is not None:
+                            estado["usado"] = estado["cota"]
+                        if sugerida is not None:
+                            estado["bloqueado_ate"] = max(estado["bloqueado_ate"], time.time() + sugerida)
+                if status in STATUS_SEM_RETRY or _cota_excedida(e, status) or tentativa == max_tentativas:
+                    raise
+                # Backoff exponencial com jitter completo, salvo se o servidor disse quanto esperar
+                espera = sugerida if sugerida is not None else random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** tentativa))
+                logger.warning(f"{servico}: tentativa {tentativa} falhou ({str(e)}); nova tentativa em {espera:.1f}s")
+                if espera > espera_maxima:
+                    raise
+                contar("retentativas", servico=servico)
+                if not self.aguardar(espera):
+                    raise
+
+    def relatorio(self):
+        """Cota restante e contadores por serviço.
+
+        O uso é contado neste processo: o dashboard e a coleta headless têm contagens
+        separadas, e reiniciar o processo zera a contagem, não a cota do provedor.
+        Com vários processos, a cota restante real é menor que a informada.
+        """
+        with self._lock:
+            agora = time.time()
+            return {
+                servico: {
+                    "cota_restante": None if estado["cota"] is None else max(0, estado["cota"] - estado["usado"]),
+                    "contagem": "por processo",
+                    "reinicia_em": None if estado["janela"] is None else max(0.0, estado["fim_janela"] - agora),
+                    "bloqueado_por": max(0.0, estado["bloqueado_ate"] - agora),
+                    "chamadas": estado["chamadas"],
+                    "falhas": estado["falhas"],
+                    "limitadas": estado["limitadas"],
+                }
+                for servico, estado in self._servicos.items()
+            }
+
+
+# Instância única do processo, usada por todos os coletores
+agendador = AgendadorLimites()
+
+
+def relatorio_cotas():
+    return agendador.relatorio()
@@ -0,0 +1,27 @@
+import numpy as np
+
+# Pontos máximos de uma série enviada ao navegador
+MAX_PONTOS = 500
+
+
+def lttb(x, y, n_pontos=MAX_PONTOS):
+    """Índices escolhidos pelo Largest-Triangle-Three-Buckets: preserva picos e forma da série."""
+    n = len(y)
+    if n_pontos >= n or n_pontos < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    indices = np.empty(n_pontos, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    limites = np.linspace(1, n - 1, n_pontos - 1).astype(np.int64)
+    anterior = 0
+    for i in range(n_pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        # Média do próximo balde é o terceiro vértice do triângulo
+        prox_inicio, prox_fim = fim, limites[i + 2] if i + 2 < len(limites) else n
+        media_x, media_y = x[prox_inicio:prox_fim].mean(), y[prox_inicio:prox_fim].mean()
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+    return indices
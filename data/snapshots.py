@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import date
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from data.esquemas import CHAVES_NATURAIS, aplicar_esquema, deduplicar, marcar_versao
+from data.instrumentacao import contar, medir
+
+logger = logging.getLogger(__name__)
+
+# Layout: snapshots/fonte=<fonte>/data_coleta=<AAAA-MM-DD>/parte-<...>.parquet
+DIR_SNAPSHOTS = "snapshots"
+# Marca d'água e hora da última consulta ao Supabase; o pyarrow ignora arquivos com "_"
+ARQUIVO_ESTADO = "_estado.json"
+# Segundos entre consultas de novidades ao Supabase
+TTL_ATUALIZACAO = 300
+# Acima disto a fonte é compactada: um arquivo por partição e uma linha por chave natural
+MAX_ARQUIVOS = 16
+
+_PARTICIONAMENTO = ds.partitioning(pa.schema([("data_coleta", pa.string())]), flavor="hive")
+_SISTEMA_ARQUIVOS = pafs.LocalFileSystem(use_mmap=True)
+
+
+def _dir_fonte(fonte, diretorio):
+    return os.path.join(diretorio, f"fonte={fonte}")
+
+
+def _arquivos(fonte, diretorio):
+    # Só lista o diretório; nenhum rodapé de Parquet é aberto
+    base = _dir_fonte(fonte, diretorio)
+    return sorted(os.path.join(raiz, nome) for raiz, _, nomes in os.walk(base)
+                  for nome in nomes if nome.endswith(".parquet"))
+
+
+def _ler_estado(fonte, diretorio):
+    try:
+        with open(os.path.join(_dir_fonte(fonte, diretorio), ARQUIVO_ESTADO), encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _gravar_estado(fonte, diretorio, estado):
+    caminho = os.path.join(_dir_fonte(fonte, diretorio), ARQUIVO_ESTADO)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as arquivo:
+        json.dump(estado, arquivo)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def _sem_dicionarios(tabela):
+    # Colunas categóricas vão como texto: o Parquet já as codifica em dicionário no disco,
+    # e assim todos os arquivos da fonte têm esquemas unificáveis. Na leitura o esquema
+    # da fonte volta a convertê-las em categorias.
+    campos = [pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f for f in tabela.schema]
+    return tabela.cast(pa.schema(campos))
+
+
+def _gravar_parte(df, fonte, data_coleta, diretorio):
+    destino = os.path.join(_dir_fonte(fonte, diretorio), f"data_coleta={data_coleta}")
+    os.makedirs(destino, exist_ok=True)
+    # Nome com time_ns: a ordem dos arquivos é a ordem das gravações
+    caminho = os.path.join(destino, f"parte-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet")
+    tabela = _sem_dicionarios(pa.Table.from_pandas(df, preserve_index=False))
+    # Grava em arquivo temporário e renomeia: leitores nunca veem um Parquet pela metade
+    pq.write_table(tabela, caminho + ".tmp")
+    os.replace(caminho + ".tmp", caminho)
+    return caminho
+
+
+def salvar_snapshot(df, fonte, data_coleta=None, diretorio=DIR_SNAPSHOTS):
+    if not isinstance(df, pd.DataFrame) or df.empty:
+        return None
+    data_coleta = (data_coleta or date.today()).isoformat()
+    with medir("armazenamento", destino="snapshot", operacao="gravar", tabela=fonte):
+        caminho = _gravar_parte(df, fonte, data_coleta, diretorio)
+    contar("registros_gravados", len(df), destino="snapshot", tabela=fonte)
+    contar("bytes_gravados", os.path.getsize(caminho), destino="snapshot", tabela=fonte)
+    logger.info(f"Snapshot de {fonte} salvo: {len(df)} registros em {caminho}")
+    return caminho
+
+
+def _unificar_esquemas(esquemas):
+    try:
+        return pa.unify_schemas(esquemas, promote_options="permissive")
+    except pa.ArrowTypeError:
+        # O tipo de uma coluna mudou entre versões (trends.data era texto, hoje é date):
+        # a coluna em conflito é lida como texto e o esquema da fonte a converte de volta;
+        # a compactação regrava os arquivos no tipo atual
+        tipos = {}
+        for esquema in esquemas:
+            for campo in esquema:
+                tipos.setdefault(campo.name, []).append(campo.type)
+        campos = []
+        for nome, lista in tipos.items():
+            try:
+                campos.append(pa.unify_schemas([pa.schema([(nome, t)]) for t in lista], promote_options="permissive")[0])
+            except pa.ArrowTypeError:
+                campos.append(pa.field(nome, pa.string()))
+        return pa.schema(campos)
+
+
+def _abrir_dataset(fonte, diretorio):
+    base = _dir_fonte(fonte, diretorio)
+    if not os.path.isdir(base):
+        return None
+    dataset = ds.dataset(base, format="parquet", partitioning=_PARTICIONAMENTO,
+                         filesystem=_SISTEMA_ARQUIVOS, exclude_invalid_files=True)
+    # Coletas podem ter ganhado colunas com o tempo: unifica os esquemas lendo só os rodapés.
+    # Depois da compactação os arquivos já concordam e o dataset é aproveitado como está.
+    esquemas = [f.physical_schema for f in dataset.get_fragments()]
+    if all(e.equals(esquemas[0]) for e in esquemas[1:]):
+        return dataset
+    esquema = _unificar_esquemas(esquemas + [_PARTICIONAMENTO.schema])
+    return ds.dataset(base, schema=esquema, format="parquet", partitioning=_PARTICIONAMENTO,
+                      filesystem=_SISTEMA_ARQUIVOS, exclude_invalid_files=True)
+
+
+def carregar_snapshot(fonte, colunas=None, desde=None, diretorio=DIR_SNAPSHOTS):
+    """Lê o snapshot local de `fonte` (ou None se não existir).
+
+    Os arquivos são mapeados em memória e só as `colunas` pedidas (mais a chave
+    natural, para deduplicar entre coletas) são lidas. `desde` filtra partições
+    com data_coleta >= desde.
+    """
+    dataset = _abrir_dataset(fonte, diretorio)
+    if dataset is None:
+        return None
+    chaves = [c for c in CHAVES_NATURAIS.get(fonte, []) if c in dataset.schema.names]
+    leitura = None
+    if colunas:
+        leitura = [c for c in dict.fromkeys(list(colunas) + chaves) if c in dataset.schema.names]
+    filtro = ds.field("data_coleta") >= str(desde) if desde is not None else None
+    with medir("armazenamento", destino="snapshot", operacao="ler", tabela=fonte):
+        df = dataset.to_table(columns=leitura, filter=filtro).to_pandas()
+    contar("registros_lidos", len(df), destino="snapshot", tabela=fonte)
+    if df.empty:
+        return df
+    # Partições em ordem de data: a coleta mais recente de cada item prevalece
+    df = deduplicar(df, fonte)
+    if colunas:
+        df = df[[c for c in colunas if c in df.columns]]
+    return aplicar_esquema(df.reset_index(drop=True), fonte)
+
+
+def compactar_snapshot(fonte, diretorio=DIR_SNAPSHOTS):
+    """Reescreve `fonte` com um arquivo por partição e só a versão mais recente de cada item.
+
+    Cada item fica na partição da sua última coleta, então o filtro `desde` continua valendo.
+    Os arquivos novos são gravados antes de os antigos serem apagados: um leitor no meio
+    do caminho vê linhas repetidas, que a deduplicação da leitura já descarta.
+    """
+    antigos = _arquivos(fonte, diretorio)
+    dataset = _abrir_dataset(fonte, diretorio)
+    if dataset is None or len(antigos) <= 1:
+        return 0
+    with medir("armazenamento", destino="snapshot", operacao="compactar", tabela=fonte):
+        # Regrava no esquema atual da fonte (colunas que mudaram de tipo saem convertidas)
+        df = aplicar_esquema(deduplicar(dataset.to_table().to_pandas(), fonte), fonte)
+        for data_coleta, parte in df.groupby("data_coleta", sort=True, observed=True):
+            _gravar_parte(parte.drop(columns="data_coleta"), fonte, data_coleta, diretorio)
+        for caminho in antigos:
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass  # Outro processo compactou ao mesmo tempo
+    novos = _arquivos(fonte, diretorio)
+    for raiz, subdiretorios, nomes in os.walk(_dir_fonte(fonte, diretorio), topdown=False):
+        if raiz != _dir_fonte(fonte, diretorio) and not subdiretorios and not nomes:
+            os.rmdir(raiz)
+    logger.info(f"Snapshot de {fonte} compactado: {len(antigos)} -> {len(novos)} arquivos, {len(df)} registros")
+    return len(novos)
+
+
+def compactar_se_necessario(fonte, diretorio=DIR_SNAPSHOTS, max_arquivos=MAX_ARQUIVOS):
+    if len(_arquivos(fonte, diretorio)) > max_arquivos:
+        try:
+            compactar_snapshot(fonte, diretorio)
+        except Exception as e:
+            logger.error(f"Erro ao compactar snapshot de {fonte}: {str(e)}")
+
+
+def _versionar(df, fonte, diretorio):
+    # Partes têm nomes únicos e nunca são reescritas: o conjunto de arquivos identifica os dados
+    arquivos = "|".join(os.path.relpath(c, diretorio) for c in _arquivos(fonte, diretorio))
+    return marcar_versao(df, hashlib.sha1(f"{fonte}|{arquivos}".encode()).hexdigest())
+
+
+def carregar_com_snapshot(fonte, colunas, atualizador, ttl=TTL_ATUALIZACAO, diretorio=DIR_SNAPSHOTS):
+    """Cache de leitura na frente do Supabase, completado de forma incremental.
+
+    `atualizador(desde)` devolve (linhas novas ou alteradas depois da marca `desde`, nova
+    marca); com `desde=None`, a tabela inteira. Sem snapshot local tudo vem dele. Com
+    snapshot, só se pergunta por novidades `ttl` segundos depois da última consulta, e o que
+    chega (inclusive de coletas feitas em outra máquina) vira mais uma parte do snapshot.
+    O resultado traz em attrs a versão do conjunto de arquivos, chave barata para caches.
+    """
+    try:
+        df = carregar_snapshot(fonte, colunas, diretorio=diretorio)
+    except Exception as e:
+        logger.error(f"Erro ao ler snapshot de {fonte}: {str(e)}")
+        df = None
+    tem_snapshot = df is not None and not df.empty
+    estado = _ler_estado(fonte, diretorio)
+    if tem_snapshot and time.time() - estado.get("verificado_em", 0) < ttl:
+        logger.info(f"{fonte} carregado do snapshot local: {len(df)} registros")
+        return _versionar(df, fonte, diretorio)
+
+    marca = estado.get("marca") if tem_snapshot else None
+    novos, nova_marca = atualizador(marca)
+    if isinstance(novos, pd.DataFrame) and not novos.empty:
+        salvar_snapshot(novos, fonte, diretorio=diretorio)
+        novos = novos[[c for c in colunas if c in novos.columns]] if colunas else novos
+        if tem_snapshot:
+            df = aplicar_esquema(deduplicar(pd.concat([df, novos], ignore_index=True), fonte).reset_index(drop=True), fonte)
+        else:
+            df = novos
+        logger.info(f"{fonte}: {len(novos)} registros novos ou alterados vindos do Supabase")
+    _gravar_estado(fonte, diretorio, {"marca": nova_marca, "verificado_em": time.time()})
+    compactar_se_necessario(fonte, diretorio)
+    return _versionar(df if df is not None else pd.DataFrame(), fonte, diretorio)
@@ -1,21 +1,21 @@
 import pandas as pd
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-import streamlit as st
+from data.clientes import cliente_spotify
+from data.limites import agendador
+from data.cache_respostas import cache
+from data.esquemas import aplicar_esquema
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def coletar_dados_spotify():
+def coletar_dados_spotify(usar_cache=True):
     try:
-        client_id = st.secrets["spotify"]["client_id"]
-        client_secret = st.secrets["spotify"]["client_secret"]
-        client_credentials_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
-        sp = spotipy.Spotify(client_credentials_manager=client_credentials_manager)
+        sp = cliente_spotify()
 
         # Exemplo: buscar as 10 músicas mais populares
-        results = sp.search(q='top tracks', type='track', limit=10)
+        params = {"q": 'top tracks', "type": 'track', "limit": 10}
+        results = cache.obter_ou_calcular("spotify", "search", params,
+                                          lambda: agendador.executar("spotify", sp.search, **params),
+                                          forcar=not usar_cache)
         tracks = results['tracks']['items']
 
         data = []
@@ -25,7 +25,7 @@ def coletar_dados_spotify():
                 "artista": track['artists'][0]['name'],
                 "popularidade": track['popularity']
             })
-        df = pd.DataFrame(data)
+        df = aplicar_esquema(pd.DataFrame(data, columns=["nome", "artista", "popularidade"]), "spotify")
         logger.info(f"Dados coletados do Spotify: {len(df)} registros")
         if df.empty:
             logger.warning("Nenhum dado coletado do Spotify")
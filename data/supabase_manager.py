@@ -1,46 +1,166 @@
-from supabase import create_client
 import pandas as pd
-import streamlit as st
 import logging
 import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from data.esquemas import CHAVES_NATURAIS, aplicar_esquema, deduplicar
+from data.clientes import cliente_supabase
+from data.credenciais import tem_credenciais
+from data.cache_respostas import cache
+from data.instrumentacao import contar, medir
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def inicializar_supabase():
-    if "supabase" not in st.secrets or "url" not in st.secrets["supabase"] or "key" not in st.secrets["supabase"]:
-        logger.error("Credenciais do Supabase não encontradas em st.secrets")
-        st.error("Erro: Credenciais do Supabase ausentes. Verifique o secrets.toml.")
-        st.stop()
-    url = st.secrets["supabase"]["url"]
-    key = st.secrets["supabase"]["key"]
-    return create_client(url, key)
-
-def salvar_df_supabase(df, tabela):
-    supabase = inicializar_supabase()
+    if not tem_credenciais("supabase", "url", "key"):
+        logger.error("Credenciais do Supabase não encontradas")
+        raise RuntimeError("Credenciais do Supabase ausentes. Verifique o secrets.toml ou SUPABASE_URL/SUPABASE_KEY.")
+    return cliente_supabase()
+
+# Limites de cada lote de escrita: linhas e tamanho aproximado do JSON enviado
+MAX_LINHAS_LOTE = 500
+MAX_BYTES_LOTE = 512 * 1024
+
+def _dividir_em_lotes(registros, max_linhas=MAX_LINHAS_LOTE, max_bytes=MAX_BYTES_LOTE):
+    lote, tamanho = [], 0
+    for registro in registros:
+        bytes_registro = len(json.dumps(registro, ensure_ascii=False).encode("utf-8"))
+        if lote and (len(lote) >= max_linhas or tamanho + bytes_registro > max_bytes):
+            yield lote
+            lote, tamanho = [], 0
+        lote.append(registro)
+        tamanho += bytes_registro
+    if lote:
+        yield lote
+
+def _enviar_lote(supabase, tabela, lote, chaves, max_retries):
+    for attempt in range(1, max_retries + 1):
+        try:
+            consulta = supabase.table(tabela)
+            if chaves:
+                consulta = consulta.upsert(lote, on_conflict=",".join(chaves))
+            else:
+                consulta = consulta.insert(lote)
+            with medir("api", servico="supabase"):
+                consulta.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Lote de {len(lote)} registros em {tabela}, tentativa {attempt} falhou: {str(e)}")
+            contar("falhas_api", servico="supabase", status="desconhecido")
+            if attempt < max_retries:
+                contar("retentativas", servico="supabase")
+                time.sleep(2 ** attempt)
+    return False
+
+def salvar_df_supabase(df, tabela, max_linhas=MAX_LINHAS_LOTE, max_bytes=MAX_BYTES_LOTE, max_workers=4, max_retries=3, supabase=None):
     try:
-        # Converter DataFrame para lista de dicionários
-        data = df.to_dict(orient='records')
-        response = supabase.table(tabela).insert(data).execute()
-        logger.info(f"Dados salvos em {tabela}: {len(data)} registros")
+        supabase = supabase or inicializar_supabase()
+        chaves = CHAVES_NATURAIS.get(tabela)
+        if chaves and not all(col in df.columns for col in chaves):
+            logger.warning(f"Chave natural {chaves} ausente em {tabela}; gravando sem upsert")
+            chaves = None
+        if chaves:
+            # O Postgres rejeita um upsert que toca a mesma linha duas vezes no mesmo comando
+            df = df.drop_duplicates(subset=chaves, keep="last")
+        # Colunas `date` vão como AAAA-MM-DD; to_json as escreveria como instantes à meia-noite
+        datas = [c for c in df.columns if str(df[c].dtype).startswith("date32")]
+        if datas:
+            df = df.assign(**{c: df[c].astype("string") for c in datas})
+        # to_json serializa datas em ISO e NaN como null, o que o PostgREST aceita
+        conteudo = df.to_json(orient="records", date_format="iso", force_ascii=False)
+        registros = json.loads(conteudo)
+        lotes = list(_dividir_em_lotes(registros, max_linhas, max_bytes))
+        with medir("armazenamento", destino="supabase", operacao="gravar", tabela=tabela):
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                resultados = list(executor.map(lambda lote: _enviar_lote(supabase, tabela, lote, chaves, max_retries), lotes))
+        contar("bytes_gravados", len(conteudo.encode("utf-8")), destino="supabase", tabela=tabela)
+        # Mesmo com falha parcial, leituras em cache desta tabela ficaram desatualizadas
+        cache.invalidar(f"supabase:{tabela}")
+        falhas = resultados.count(False)
+        if falhas:
+            logger.error(f"{falhas}/{len(lotes)} lotes falharam em {tabela}")
+            return False
+        contar("registros_gravados", len(registros), destino="supabase", tabela=tabela)
+        logger.info(f"Dados salvos em {tabela}: {len(registros)} registros em {len(lotes)} lotes")
         return True
     except Exception as e:
         logger.error(f"Erro ao salvar em {tabela}: {str(e)}")
         return False
 
-def carregar_df_supabase(tabela, colunas_esperadas=None):
-    supabase = inicializar_supabase()
-    try:
-        response = supabase.table(tabela).select("*").execute()
-        registros = response.data
+# Tamanho de página das leituras (o PostgREST do Supabase limita a 1000 linhas por resposta)
+TAMANHO_PAGINA = 1000
+
+# Preenchida pelo banco no insert e avançada pelo gatilho de update (ver esquema_supabase.sql):
+# upserts que alteram linhas existentes também passam da marca d'água, o que created_at não faz
+COLUNA_ATUALIZACAO = "atualizado_em"
+# Releitura antes da marca: pega transações que gravaram com relógio anterior a ela mas ainda
+# não estavam visíveis na leitura anterior; a chave natural descarta o que se repetir
+MARGEM_MARCA = pd.Timedelta(minutes=5)
+
+def _consultar_paginas(supabase, tabela, colunas, tamanho_pagina, coluna_marca=None, desde=None):
+    seletor = ",".join(colunas) if colunas else "*"
+    # Sem ORDER BY o Postgres não garante a mesma ordem entre requisições e as páginas
+    # pulariam ou repetiriam linhas: ordena pela marca (se houver) e pela chave natural
+    ordem = ([coluna_marca] if coluna_marca else []) + (CHAVES_NATURAIS.get(tabela) or ["id"])
+    inicio = 0
+    while True:
+        consulta = supabase.table(tabela).select(seletor)
+        if coluna_marca and desde is not None:
+            consulta = consulta.gt(coluna_marca, desde)
+        for coluna in ordem:
+            consulta = consulta.order(coluna)
+        registros = consulta.range(inicio, inicio + tamanho_pagina - 1).execute().data
         if not registros:
+            break
+        yield pd.DataFrame.from_records(registros, columns=colunas or None)
+        if len(registros) < tamanho_pagina:
+            break
+        inicio += tamanho_pagina
+
+def carregar_df_supabase(tabela, colunas_esperadas=None, tamanho_pagina=TAMANHO_PAGINA, coluna_marca=None, desde=None, supabase=None):
+    try:
+        supabase = supabase or inicializar_supabase()
+        # Projeção no servidor: só as colunas esperadas trafegam
+        params = {"colunas": colunas_esperadas, "coluna_marca": coluna_marca, "desde": desde}
+        achou, df = cache.obter(f"supabase:{tabela}", "select", params)
+        if achou:
+            return df
+        with medir("armazenamento", destino="supabase", operacao="ler", tabela=tabela):
+            paginas = list(_consultar_paginas(supabase, tabela, colunas_esperadas, tamanho_pagina, coluna_marca, desde))
+        if not paginas:
             logger.warning(f"Nenhum dado encontrado em {tabela}")
             return pd.DataFrame()
-        df = pd.DataFrame(registros)
-        if colunas_esperadas and not all(col in df.columns for col in colunas_esperadas):
-            logger.warning(f"Colunas ausentes em {tabela}: {colunas_esperadas}")
-            return pd.DataFrame()
+        # Tipagem e validação acontecem aqui, uma vez por leitura
+        df = aplicar_esquema(pd.concat(paginas, ignore_index=True), tabela)
+        contar("registros_lidos", len(df), destino="supabase", tabela=tabela)
+        cache.guardar(f"supabase:{tabela}", "select", params, df)
         return df
     except Exception as e:
+        # Coluna inexistente na projeção também cai aqui (erro 400 do PostgREST)
         logger.error(f"Erro ao carregar de {tabela}: {str(e)}")
         return pd.DataFrame()
+
+def carregar_df_supabase_incremental(tabela, colunas_esperadas=None, desde=None, coluna_marca=COLUNA_ATUALIZACAO,
+                                     tamanho_pagina=TAMANHO_PAGINA, supabase=None):
+    """Linhas inseridas ou alteradas depois da marca `desde` (todas, sem marca), uma por chave natural.
+
+    Devolve (DataFrame, nova marca). A marca é um instante ISO em UTC a ser guardado por quem
+    chama (o snapshot local) e passado de volta na próxima leitura; sem novidades, volta `desde`.
+    """
+    colunas = None
+    if colunas_esperadas:
+        # Chave para mesclar com o que já está em cache e a própria coluna da marca
+        colunas = list(dict.fromkeys(list(colunas_esperadas) + CHAVES_NATURAIS.get(tabela, []) + [coluna_marca]))
+    filtro = None if desde is None else (pd.Timestamp(desde) - MARGEM_MARCA).isoformat()
+    novos = carregar_df_supabase(tabela, colunas, tamanho_pagina, coluna_marca=coluna_marca, desde=filtro, supabase=supabase)
+    if novos.empty or coluna_marca not in novos.columns:
+        return novos, desde
+    instantes = pd.to_datetime(novos[coluna_marca], utc=True, errors="coerce", format="ISO8601")
+    marca = instantes.max()
+    if desde is not None:
+        marca = max(marca, pd.Timestamp(desde))
+    # Páginas ordenadas pela marca: a versão mais recente de cada item vem por último
+    novos = deduplicar(novos, tabela).reset_index(drop=True)
+    logger.info(f"{len(novos)} registros novos ou alterados em {tabela} desde {desde}")
+    return novos, marca.isoformat()
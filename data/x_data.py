@@ -1,44 +1,74 @@
 import pandas as pd
-import tweepy
+from data.clientes import cliente_x
 import logging
-import streamlit as st
 import time
+from data.limites import agendador
+from data.cache_respostas import cache
+from data.esquemas import aplicar_esquema
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@st.cache_data
-def coletar_dados_x(start_time=None, max_retries=3):
+QUERY = "from:Brazil (filme OR série OR música) -is:retweet lang:pt"
+# Limite de search_recent_tweets por página
+TAMANHO_PAGINA = 100
+
+def _buscar_pagina(client, params, max_retries, usar_cache=True):
+    # Objetos do tweepy não são serializáveis: o cache guarda o lote já convertido e o next_token
+    def chamar_api():
+        logger.info("Coletando tweets")
+        tweets = agendador.executar("x", client.search_recent_tweets, max_tentativas=max_retries, **params)
+        if not tweets.data:
+            return pd.DataFrame(), None
+        return _lote_tweets(tweets.data), (tweets.meta or {}).get("next_token")
+
     try:
-        bearer_token = st.secrets["x"]["bearer_token"]
-        client = tweepy.Client(bearer_token=bearer_token)
-        query = "from:Brazil (filme OR série OR música) -is:retweet lang:pt"
-        params = {"query": query, "max_results": 100, "tweet_fields": ["public_metrics", "created_at"]}
-        if start_time:
-            params["start_time"] = start_time
-        
-        for attempt in range(1, max_retries + 1):
-            try:
-                logger.info(f"Tentativa {attempt}/{max_retries}: Coletando tweets")
-                tweets = client.search_recent_tweets(**params)
-                if tweets.data:
-                    data = []
-                    for tweet in tweets.data:
-                        data.append({
-                            "assunto": tweet.text,
-                            "volume": tweet.public_metrics.get("impression_count", 0),
-                            "created_at": tweet.created_at
-                        })
-                    df = pd.DataFrame(data)
-                    logger.info(f"Dados coletados: {len(df)} tweets")
-                    return df
-            except Exception as e:
-                logger.error(f"Tentativa {attempt} falhou: {str(e)}")
-                if attempt < max_retries:
-                    time.sleep(2 ** attempt)
-                continue
-        logger.warning("Nenhum tweet após retries")
-        return pd.DataFrame()
+        return cache.obter_ou_calcular("x", "search_recent_tweets", params, chamar_api, forcar=not usar_cache)
+    except Exception as e:
+        logger.error(f"Falha ao coletar página de tweets: {str(e)}")
+        return None
+
+def _lote_tweets(tweets):
+    return pd.DataFrame({
+        "id": pd.array([str(t.id) for t in tweets], dtype="string[pyarrow]"),
+        "assunto": pd.array([t.text for t in tweets], dtype="string[pyarrow]"),
+        "volume": pd.array([(t.public_metrics or {}).get("impression_count", 0) for t in tweets], dtype="uint64"),
+        "created_at": pd.to_datetime([t.created_at for t in tweets], utc=True).astype("datetime64[ns, UTC]"),
+    })
+
+def iterar_tweets_x(start_time=None, max_itens=TAMANHO_PAGINA, tempo_max=None, max_retries=3, usar_cache=True):
+    """Gera um DataFrame por página, seguindo next_token até `max_itens` tweets ou `tempo_max` segundos."""
+    client = cliente_x()
+    params = {"query": QUERY, "tweet_fields": ["public_metrics", "created_at"]}
+    if start_time:
+        params["start_time"] = start_time
+    inicio = time.monotonic()
+    coletados = 0
+    while coletados < max_itens:
+        if tempo_max is not None and time.monotonic() - inicio > tempo_max:
+            logger.info(f"Orçamento de tempo esgotado após {coletados} tweets")
+            break
+        # A API exige max_results entre 10 e 100
+        params["max_results"] = max(10, min(TAMANHO_PAGINA, max_itens - coletados))
+        pagina = _buscar_pagina(client, params, max_retries, usar_cache)
+        if pagina is None or pagina[0].empty:
+            break
+        lote, next_token = pagina
+        lote = lote.iloc[:max_itens - coletados]
+        coletados += len(lote)
+        yield lote
+        if not next_token:
+            break
+        params["next_token"] = next_token
+
+def coletar_dados_x(start_time=None, max_retries=3, max_itens=TAMANHO_PAGINA, tempo_max=None, usar_cache=True):
+    try:
+        lotes = list(iterar_tweets_x(start_time, max_itens, tempo_max, max_retries, usar_cache))
+        if not lotes:
+            logger.warning("Nenhum tweet após retries")
+            return pd.DataFrame()
+        df = aplicar_esquema(pd.concat(lotes, ignore_index=True), "twitter")
+        logger.info(f"Dados coletados: {len(df)} tweets")
+        return df
     except Exception as e:
         logger.error(f"Falha na coleta: {str(e)}")
         return pd.DataFrame()
@@ -1,46 +1,79 @@
 import pandas as pd
-import googleapiclient.discovery
-import streamlit as st
+from data.clientes import cliente_youtube, http_da_thread
 import logging
 import time
+from data.limites import agendador
+from data.cache_respostas import cache
+from data.esquemas import aplicar_esquema
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def coletar_dados_youtube(max_retries=3):
+# A API devolve no máximo 50 vídeos por página
+TAMANHO_PAGINA = 50
+
+def _buscar_pagina(youtube, page_token, max_results, max_retries, usar_cache=True):
+    params = {
+        "part": "snippet,statistics",
+        "chart": "mostPopular",
+        "regionCode": "BR",
+        "maxResults": max_results,
+        "pageToken": page_token,
+    }
+
+    def chamar_api():
+        logger.info("Coletando vídeos populares (BR)")
+        request = youtube.videos().list(**params)
+        # videos.list custa 1 unidade da cota diária; a conexão é a da thread que executa
+        return agendador.executar("youtube", lambda: request.execute(http=http_da_thread()),
+                                  custo=1, max_tentativas=max_retries)
+
     try:
-        api_key = st.secrets["youtube"]["api_key"]
-        youtube = googleapiclient.discovery.build("youtube", "v3", developerKey=api_key)
-        
-        for attempt in range(1, max_retries + 1):
-            try:
-                logger.info(f"Tentativa {attempt}/{max_retries}: Coletando vídeos populares (BR)")
-                request = youtube.videos().list(
-                    part="snippet,statistics",
-                    chart="mostPopular",
-                    regionCode="BR",
-                    maxResults=50
-                )
-                response = request.execute()
-                if response["items"]:
-                    videos = []
-                    for item in response["items"]:
-                        videos.append({
-                            "titulo": item["snippet"]["title"],
-                            "canal": item["snippet"]["channelTitle"],
-                            "visualizacoes": int(item["statistics"].get("viewCount", 0)),
-                            "likes": int(item["statistics"].get("likeCount", 0))
-                        })
-                    df = pd.DataFrame(videos)
-                    logger.info(f"Dados coletados: {len(df)} vídeos")
-                    return df
-            except Exception as e:
-                logger.error(f"Tentativa {attempt} falhou: {str(e)}")
-                if attempt < max_retries:
-                    time.sleep(2 ** attempt)
-                continue
-        logger.warning("Nenhum vídeo após retries")
-        return pd.DataFrame()
+        return cache.obter_ou_calcular("youtube", "videos.list", params, chamar_api, forcar=not usar_cache)
+    except Exception as e:
+        logger.error(f"Falha ao coletar página de vídeos: {str(e)}")
+        return None
+
+def _lote_videos(items):
+    # Colunas tipadas montadas direto das listas, sem passar por uma lista de dicts
+    snippets = [item["snippet"] for item in items]
+    estatisticas = [item.get("statistics", {}) for item in items]
+    # Categorias só no DataFrame final: o concat de lotes categóricos as desfaria
+    return pd.DataFrame({
+        "titulo": pd.array([s["title"] for s in snippets], dtype="string[pyarrow]"),
+        "canal": pd.array([s["channelTitle"] for s in snippets], dtype="string[pyarrow]"),
+        "visualizacoes": pd.array([int(e.get("viewCount", 0)) for e in estatisticas], dtype="uint64"),
+        "likes": pd.array([int(e.get("likeCount", 0)) for e in estatisticas], dtype="uint64"),
+    })
+
+def iterar_videos_youtube(max_itens=TAMANHO_PAGINA, tempo_max=None, max_retries=3, usar_cache=True):
+    """Gera um DataFrame por página, seguindo nextPageToken até `max_itens` vídeos ou `tempo_max` segundos."""
+    youtube = cliente_youtube()
+    inicio = time.monotonic()
+    coletados = 0
+    page_token = None
+    while coletados < max_itens:
+        if tempo_max is not None and time.monotonic() - inicio > tempo_max:
+            logger.info(f"Orçamento de tempo esgotado após {coletados} vídeos")
+            break
+        response = _buscar_pagina(youtube, page_token, min(TAMANHO_PAGINA, max_itens - coletados), max_retries, usar_cache)
+        if not response or not response.get("items"):
+            break
+        lote = _lote_videos(response["items"])
+        coletados += len(lote)
+        yield lote
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+
+def coletar_dados_youtube(max_retries=3, max_itens=TAMANHO_PAGINA, tempo_max=None, usar_cache=True):
+    try:
+        lotes = list(iterar_videos_youtube(max_itens, tempo_max, max_retries, usar_cache))
+        if not lotes:
+            logger.warning("Nenhum vídeo após retries")
+            return pd.DataFrame()
+        df = aplicar_esquema(pd.concat(lotes, ignore_index=True), "youtube")
+        logger.info(f"Dados coletados: {len(df)} vídeos")
+        return df
     except Exception as e:
         logger.error(f"Falha na coleta: {str(e)}")
         return pd.DataFrame()
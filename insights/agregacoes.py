@@ -0,0 +1,88 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+from data.esquemas import marcar_versao, versao_marcada
+from data.reducao import MAX_PONTOS, lttb
+
+MAX_ENTRADAS_CACHE = 64
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def versao_dados(df, colunas=None):
+    """Chave de cache dos dados: mesma versão dos dados -> mesma chave.
+
+    Tabelas carregadas do snapshot já trazem uma versão barata (o conjunto de arquivos lidos),
+    então o custo não cresce com o histórico. Só DataFrames sem versão têm o conteúdo hasheado.
+    """
+    marcada = versao_marcada(df, colunas)
+    if marcada is not None:
+        return marcada
+    if colunas is not None:
+        df = df[[c for c in colunas if c in df.columns]]
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def em_cache(chave, calcular):
+    """Devolve o valor de `chave`, calculando-o uma única vez por versão dos dados (LRU)."""
+    with _lock:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            return _cache[chave]
+    valor = calcular()
+    if isinstance(valor, pd.DataFrame):
+        # Resultado derivado ganha a própria versão (a da chave) em vez de herdar a da origem
+        marcar_versao(valor, hashlib.sha1(repr(chave).encode()).hexdigest())
+    with _lock:
+        _cache[chave] = valor
+        while len(_cache) > MAX_ENTRADAS_CACHE:
+            _cache.popitem(last=False)
+    return valor
+
+
+def limpar_cache():
+    with _lock:
+        _cache.clear()
+
+
+def agregar(df, por, valor=None, funcao="sum", top=None):
+    """Group-by de `valor` por `por` (ou contagem, sem `valor`), com os `top` maiores; calculado uma vez por versão."""
+    colunas = [por] + ([valor] if valor else [])
+
+    def calcular():
+        if valor is None:
+            resultado = df[por].value_counts().rename("contagem").rename_axis(por).reset_index()
+            coluna = "contagem"
+        else:
+            resultado = df.groupby(por, observed=True)[valor].agg(funcao).reset_index()
+            coluna = valor
+        return resultado.nlargest(top, coluna) if top else resultado
+
+    return em_cache(("agregar", versao_dados(df, colunas), por, valor, funcao, top), calcular)
+
+
+def reduzir_serie(df, x, y, n_pontos=MAX_PONTOS):
+    """Série ordenada por `x` reduzida a no máximo `n_pontos` linhas via LTTB."""
+    def calcular():
+        ordenado = df[[x, y]].dropna().sort_values(x)
+        eixo = ordenado[x]
+        if pd.api.types.is_datetime64_any_dtype(eixo):
+            eixo = eixo.astype("int64")
+        return ordenado.iloc[lttb(eixo.to_numpy(), ordenado[y].to_numpy(), n_pontos)].reset_index(drop=True)
+
+    return em_cache(("reduzir", versao_dados(df, [x, y]), x, y, n_pontos), calcular)
+
+
+def serie_temporal(df, coluna_tempo, valor, frequencia="h", funcao="sum", n_pontos=MAX_PONTOS):
+    """Agrega `valor` por período de `coluna_tempo` e reduz a série longa com LTTB."""
+    def calcular():
+        tempos = pd.to_datetime(df[coluna_tempo], utc=True, errors="coerce")
+        serie = pd.Series(pd.to_numeric(df[valor], errors="coerce").to_numpy(), index=tempos)
+        agregada = serie[serie.index.notna()].resample(frequencia).agg(funcao).rename(valor)
+        agregada = agregada.rename_axis(coluna_tempo).reset_index()
+        return reduzir_serie(agregada, coluna_tempo, valor, n_pontos)
+
+    return em_cache(("serie", versao_dados(df, [coluna_tempo, valor]), coluna_tempo, valor, frequencia, funcao, n_pontos),
+                    calcular)
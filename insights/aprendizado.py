@@ -1,15 +1,109 @@
-from mlxtend.frequent_patterns import apriori
-from mlxtend.frequent_patterns import association_rules
+import hashlib
+import math
+import numpy as np
 import pandas as pd
 import streamlit as st
+from data.instrumentacao import medir
+from insights.indice_termos import codificar
 
-def analisar_apriori(df_trends, df_x):
-    # Combinar termos e assuntos em uma matriz binária
-    combined = pd.concat([df_trends['termo'], df_x['assunto']]).value_counts().head(10).index
-    data = pd.DataFrame(index=range(len(combined)), columns=combined).fillna(0)
-    st.write("Regras de Associação (Apriori):", association_rules(apriori(data, min_support=0.1), metric="confidence"))
+def montar_transacoes(df_trends, df_x):
+    """Pares (transação, termo) sem repetição, o vocabulário e o número de transações.
+
+    Cada tweet é uma transação; cada janela de tendências (data de coleta) é outra. Os textos
+    são codificados uma vez, de forma vetorizada; transações sem termos ficam de fora.
+    """
+    tweets = df_x["assunto"].dropna()
+    trends = df_trends.dropna(subset=["termo"])
+    if "data" in trends.columns:
+        # Linhas sem data ficam fora de qualquer janela, como no groupby
+        janelas, _ = pd.factorize(trends["data"], sort=True)
+    else:
+        janelas = np.zeros(len(trends), dtype=np.int64)
+    posicoes_x, codigos_x, vocabulario_x = codificar(tweets)
+    posicoes_t, codigos_t, vocabulario_t = codificar(trends["termo"])
+    # Um só vocabulário para as duas fontes
+    unificados, vocabulario = pd.factorize(np.concatenate([vocabulario_x, vocabulario_t]))
+    janelas_t = janelas[posicoes_t]
+    validos = janelas_t >= 0
+    linhas = np.concatenate([posicoes_x, len(tweets) + janelas_t[validos]])
+    termos = np.concatenate([unificados[:len(vocabulario_x)][codigos_x],
+                             unificados[len(vocabulario_x):][codigos_t[validos]]])
+    # Vários termos de tendência da mesma janela podem repetir um token (ordenar e cortar
+    # repetidos é bem mais rápido que np.unique, que usa hash, para chaves int64 largas)
+    pares = np.sort(linhas * max(len(vocabulario), 1) + termos)
+    pares = pares[np.diff(pares, prepend=-1) != 0]
+    linhas, termos = np.divmod(pares, max(len(vocabulario), 1))
+    # Pares já ordenados por transação: renumera só as que têm termos
+    linhas = np.cumsum(np.diff(linhas, prepend=-1) != 0) - 1
+    return linhas, termos, np.asarray(vocabulario, dtype=object), int(linhas[-1]) + 1 if len(linhas) else 0
+
+
+def impressao_dados(*dfs):
+    # Identifica o conjunto de dados sem depender do objeto: hash vetorizado das linhas
+    h = hashlib.sha1()
+    for df in dfs:
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+@medir("analise", passo="apriori")
+def _minerar_regras(impressao, _df_trends, _df_x, min_suporte, min_confianca, min_lift, max_itens, max_vocabulario):
+    # mlxtend e scipy só são carregados quando a seção Apriori é renderizada
+    from mlxtend.frequent_patterns import association_rules, fpgrowth
+    from scipy import sparse
+
+    linhas, termos, vocabulario, n_transacoes = montar_transacoes(_df_trends, _df_x)
+    if not n_transacoes:
+        return pd.DataFrame()
+    # Termos abaixo do suporte mínimo nunca formam itemset frequente: ficam fora da matriz
+    frequencia = np.bincount(termos, minlength=len(vocabulario))
+    candidatos = np.flatnonzero(frequencia >= max(1, math.ceil(min_suporte * n_transacoes)))
+    if not len(candidatos):
+        return pd.DataFrame()
+    # Os `max_vocabulario` termos mais frequentes, em ordem alfabética
+    mantidos = candidatos[np.argsort(-frequencia[candidatos], kind="stable")[:max_vocabulario]]
+    mantidos = mantidos[np.argsort(vocabulario[mantidos])]
+    colunas = np.full(len(vocabulario), -1)
+    colunas[mantidos] = np.arange(len(mantidos))
+    colunas = colunas[termos]
+    dentro = colunas >= 0
+    matriz = sparse.csr_matrix((np.ones(int(dentro.sum()), dtype=bool), (linhas[dentro], colunas[dentro])),
+                               shape=(n_transacoes, len(mantidos)))
+    dados = pd.DataFrame.sparse.from_spmatrix(matriz, columns=vocabulario[mantidos])
+    itemsets = fpgrowth(dados, min_support=min_suporte, use_colnames=True, max_len=max_itens)
+    if len(itemsets) < 2:
+        return pd.DataFrame()
+    regras = association_rules(itemsets, num_itemsets=n_transacoes, metric="confidence", min_threshold=min_confianca)
+    regras = regras[regras["lift"] >= min_lift]
+    return regras.sort_values("lift", ascending=False).reset_index(drop=True)
+
+
+def analisar_apriori(df_trends, df_x, min_suporte=0.01, min_confianca=0.3, min_lift=1.2, max_itens=3, max_vocabulario=5000):
+    impressao = impressao_dados(df_trends[["termo"]], df_x[["assunto"]])
+    regras = _minerar_regras(impressao, df_trends, df_x, min_suporte, min_confianca, min_lift, max_itens, max_vocabulario)
+    if regras.empty:
+        st.info("Nenhuma regra de associação encontrada com os limiares atuais.")
+        return regras
+    exibicao = regras[["antecedents", "consequents", "support", "confidence", "lift"]].copy()
+    exibicao["antecedents"] = exibicao["antecedents"].map(lambda s: ", ".join(sorted(s)))
+    exibicao["consequents"] = exibicao["consequents"].map(lambda s: ", ".join(sorted(s)))
+    st.write("Regras de Associação (FP-Growth):", exibicao.head(50))
+    return regras
 
 def analisar_clusters(df_spotify, df_youtube):
-    # Exemplo básico de clustering (substitua por KMeans real)
-    combined = pd.concat([df_spotify[['popularidade']], df_youtube[['visualizacoes']]]).dropna()
-    st.write("Clusters (exemplo):", combined.describe())
+    from insights.clusterizacao import prever_clusters
+
+    itens = prever_clusters(df_spotify, df_youtube)
+    if itens.empty or "cluster" not in itens.columns or itens["cluster"].isna().all():
+        st.info("Dados insuficientes para agrupar conteúdos.")
+        return itens
+    resumo = itens.groupby("cluster").agg(
+        itens=("item", "size"),
+        videos=("eh_video", "sum"),
+        popularidade_media=("popularidade", "mean"),
+        log_visualizacoes_medio=("log_visualizacoes", "mean"),
+        taxa_engajamento_media=("taxa_engajamento", "mean"),
+    )
+    st.write("Clusters (MiniBatchKMeans):", resumo)
+    return itens
@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import os
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import MinMaxScaler
+from data.instrumentacao import medir
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_MODELO = os.path.join("modelos", "clusters.joblib")
+N_CLUSTERS = 4
+COLUNAS_FEATURES = ["log_visualizacoes", "log_likes", "popularidade", "taxa_engajamento", "eh_video"]
+# Faixa esperada de cada feature: a escala não depende de qual fonte chegou primeiro
+# (um lote só de vídeos tem popularidade sempre 0 e congelaria a escala errada)
+FAIXAS_FEATURES = {
+    "log_visualizacoes": (0.0, float(np.log1p(1e10))),
+    "log_likes": (0.0, float(np.log1p(1e8))),
+    "popularidade": (0.0, 100.0),
+    "taxa_engajamento": (0.0, 0.1),
+    "eh_video": (0.0, 1.0),
+}
+# Muda quando o formato do estado salvo deixa de ser compatível (v2: escala por faixas fixas)
+VERSAO_MODELO = 2
+# Quantos lotes já vistos guardar para não treinar duas vezes com a mesma coleta
+MAX_LOTES_VISTOS = 500
+
+# Estado por arquivo, com o mtime lido: outro processo (o coletor agendado) pode ter salvo depois
+_estados = {}
+_lock = threading.Lock()
+
+
+def extrair_features(df_spotify, df_youtube):
+    """Uma linha por item (música ou vídeo) com as features numéricas do agrupamento."""
+    partes = []
+    if isinstance(df_spotify, pd.DataFrame) and not df_spotify.empty:
+        n = len(df_spotify)
+        partes.append(pd.DataFrame({
+            "item": df_spotify["nome"].to_numpy(),
+            "fonte": "spotify",
+            "log_visualizacoes": np.zeros(n),
+            "log_likes": np.zeros(n),
+            "popularidade": pd.to_numeric(df_spotify["popularidade"], errors="coerce").fillna(0).to_numpy(),
+            "taxa_engajamento": np.zeros(n),
+            "eh_video": np.zeros(n),
+        }))
+    if isinstance(df_youtube, pd.DataFrame) and not df_youtube.empty:
+        views = pd.to_numeric(df_youtube["visualizacoes"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+        likes = (pd.to_numeric(df_youtube["likes"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+                 if "likes" in df_youtube.columns else np.zeros(len(df_youtube)))
+        partes.append(pd.DataFrame({
+            "item": df_youtube["titulo"].to_numpy(),
+            "fonte": "youtube",
+            "log_visualizacoes": np.log1p(views),
+            "log_likes": np.log1p(likes),
+            "popularidade": np.zeros(len(df_youtube)),
+            "taxa_engajamento": np.divide(likes, views, out=np.zeros_like(likes), where=views > 0),
+            "eh_video": np.ones(len(df_youtube)),
+        }))
+    if not partes:
+        return pd.DataFrame(columns=["item", "fonte"] + COLUNAS_FEATURES)
+    return pd.concat(partes, ignore_index=True)
+
+
+def _novo_estado():
+    # Linha 0 com os mínimos e linha 1 com os máximos, na ordem de COLUNAS_FEATURES
+    faixas = np.array([FAIXAS_FEATURES[c] for c in COLUNAS_FEATURES]).T
+    return {
+        "versao": VERSAO_MODELO,
+        "escalador": MinMaxScaler().fit(faixas),
+        "modelo": MiniBatchKMeans(n_clusters=N_CLUSTERS, random_state=42),
+        "lotes_vistos": [],
+        "treinado": False,
+    }
+
+
+def _mtime(caminho):
+    try:
+        return os.stat(caminho).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _carregar_estado(caminho):
+    # Relê o arquivo quando ele mudou desde a última leitura ou gravação deste processo
+    mtime = _mtime(caminho)
+    if caminho in _estados and _estados[caminho][0] == mtime:
+        return _estados[caminho][1]
+    estado = _novo_estado()
+    if mtime is not None:
+        try:
+            salvo = joblib.load(caminho)
+            if salvo.get("versao") == VERSAO_MODELO:
+                estado = salvo
+            else:
+                logger.info("Modelo de clusters salvo em formato antigo; recomeçando o treino")
+        except Exception as e:
+            logger.error(f"Erro ao carregar modelo de clusters: {str(e)}")
+    _estados[caminho] = (mtime, estado)
+    return estado
+
+
+def _salvar_estado(estado, caminho):
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    joblib.dump(estado, caminho + ".tmp")
+    os.replace(caminho + ".tmp", caminho)
+    _estados[caminho] = (_mtime(caminho), estado)
+
+
+@medir("analise", passo="treino_clusters")
+def atualizar_clusters(df_spotify, df_youtube, caminho=CAMINHO_MODELO):
+    """Treina incrementalmente (partial_fit) só com o lote novo e persiste o estado."""
+    features = extrair_features(df_spotify, df_youtube)
+    if features.empty:
+        return False
+    impressao = hashlib.sha1(pd.util.hash_pandas_object(features, index=False).to_numpy().tobytes()).hexdigest()
+    with _lock:
+        estado = _carregar_estado(caminho)
+        if impressao in estado["lotes_vistos"]:
+            return False
+        if not estado["treinado"] and len(features) < N_CLUSTERS:
+            logger.warning(f"Lote com {len(features)} itens é pequeno demais para iniciar {N_CLUSTERS} clusters")
+            return False
+        X = features[COLUNAS_FEATURES].to_numpy(dtype="float64")
+        estado["modelo"].partial_fit(estado["escalador"].transform(X))
+        estado["treinado"] = True
+        estado["lotes_vistos"] = (estado["lotes_vistos"] + [impressao])[-MAX_LOTES_VISTOS:]
+        _salvar_estado(estado, caminho)
+    logger.info(f"Clusters atualizados com lote de {len(features)} itens")
+    return True
+
+
+@medir("analise", passo="previsao_clusters")
+def prever_clusters(df_spotify, df_youtube, caminho=CAMINHO_MODELO):
+    """Atribui cada item ao cluster mais próximo; treina com estes dados se ainda não há modelo."""
+    features = extrair_features(df_spotify, df_youtube)
+    if features.empty:
+        return features.assign(cluster=pd.Series(dtype="int32"))
+    with _lock:
+        treinado = _carregar_estado(caminho)["treinado"]
+    if not treinado and not atualizar_clusters(df_spotify, df_youtube, caminho):
+        return features.assign(cluster=pd.Series(dtype="int32"))
+    with _lock:
+        estado = _carregar_estado(caminho)
+        X = estado["escalador"].transform(features[COLUNAS_FEATURES].to_numpy(dtype="float64"))
+        rotulos = estado["modelo"].predict(X)
+    return features.assign(cluster=rotulos.astype("int32"))
@@ -0,0 +1,174 @@
+import functools
+import hashlib
+import itertools
+import logging
+import unicodedata
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Usadas quando o corpus de stopwords do NLTK não está baixado (já sem acento)
+STOPWORDS_BASICAS = {
+    "que", "para", "com", "uma", "por", "nao", "mais", "como", "mas", "dos", "das", "ele", "ela",
+    "isso", "esse", "essa", "este", "esta", "seu", "sua", "tem", "ter", "foi", "ser", "sao", "muito",
+    "quando", "pra", "pro", "voce", "vai", "tudo", "nos", "aqui", "so", "the", "and", "you", "for",
+}
+
+_URL = r"https?://\S+|www\.\S+|[@#]\w+"
+_TOKEN = r"[a-z0-9]{3,}"
+_ACENTOS = "[\u0300-\u036f]"  # marcas combinantes que sobram após NFKD
+
+# Assinaturas SimHash de 64 bits em 4 bandas de 16: textos a até 3 bits de distância
+# coincidem em pelo menos uma banda (princípio da casa dos pombos)
+BANDAS_SIMHASH = 4
+DISTANCIA_MAX_DUPLICATA = 3
+# Pares candidatos (mesmo balde de banda) comparados de uma vez; limita a memória
+MAX_PARES_BLOCO = 2_000_000
+# Bits ligados de cada valor de 16 bits: distância de Hamming sem depender de np.bitwise_count
+_BITS_16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+
+def _sem_acentos(texto):
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+@functools.lru_cache(maxsize=1)
+def stopwords():
+    try:
+        from nltk.corpus import stopwords as corpus
+        palavras = corpus.words("portuguese") + corpus.words("english")
+        return frozenset(_sem_acentos(p.lower()) for p in palavras) | STOPWORDS_BASICAS
+    except LookupError:
+        logger.info("Corpus de stopwords do NLTK ausente (nltk.download('stopwords')); usando lista básica")
+        return frozenset(STOPWORDS_BASICAS)
+
+
+def tokenizar_serie(serie):
+    """Normaliza uma Series de textos com operações vetorizadas do pandas; devolve listas de tokens."""
+    texto = (serie.astype("string").fillna("").str.lower()
+             .str.replace(_URL, " ", regex=True)
+             .str.normalize("NFKD").str.replace(_ACENTOS, "", regex=True))
+    return texto.str.findall(_TOKEN)
+
+
+def codificar(serie):
+    """Pares (posição do documento, código do termo) sem stopwords e sem repetição, e o vocabulário.
+
+    Os termos são fatorados em inteiros uma única vez; filtro de stopwords e deduplicação
+    trabalham sobre os códigos. Os pares saem ordenados por documento.
+    """
+    listas = tokenizar_serie(serie)
+    tamanhos = listas.str.len().to_numpy(dtype=np.int64)
+    posicoes = np.repeat(np.arange(len(serie), dtype=np.int64), tamanhos)
+    termos = np.fromiter(itertools.chain.from_iterable(listas), dtype=object, count=int(tamanhos.sum()))
+    codigos, vocabulario = pd.factorize(termos)
+    validos = ~pd.Index(vocabulario).isin(stopwords())
+    mascara = validos[codigos]
+    posicoes, codigos = posicoes[mascara], codigos[mascara]
+    _, primeiros = np.unique(posicoes * max(len(vocabulario), 1) + codigos, return_index=True)
+    return posicoes[primeiros], codigos[primeiros], np.asarray(vocabulario, dtype=object)
+
+
+def _assinaturas_simhash(posicoes, codigos, vocabulario, n_documentos):
+    # Cada termo distinto é hasheado uma vez; os votos de bit (+1/-1) somam por documento
+    hashes = np.array([int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "little")
+                       for t in vocabulario], dtype=np.uint64)
+    bits = ((hashes[None, :] >> np.arange(64, dtype=np.uint64)[:, None]) & np.uint64(1)).astype(np.int8) * 2 - 1
+    assinaturas = np.zeros(n_documentos, dtype=np.uint64)
+    # Um bit por vez: bincount soma os votos de cada documento sem materializar a matriz documentos x 64
+    for bit in range(64):
+        votos = np.bincount(posicoes, weights=bits[bit][codigos], minlength=n_documentos)
+        assinaturas |= (votos > 0).astype(np.uint64) << np.uint64(bit)
+    return assinaturas
+
+
+def _distancias(a, b):
+    diferencas = np.bitwise_xor(a, b)
+    return sum(_BITS_16[((diferencas >> np.uint64(16 * k)) & np.uint64(0xFFFF)).astype(np.intp)].astype(np.int64)
+               for k in range(4))
+
+
+def _pares_proximos(assinaturas, distancia_max):
+    """Pares (i, j), com j < i, de assinaturas a até `distancia_max` bits.
+
+    Candidatos são os pares que coincidem em alguma banda: em cada banda os documentos são
+    ordenados pelo valor da banda e cada um é pareado com os anteriores do mesmo balde.
+    """
+    n = len(assinaturas)
+    proximos_i, proximos_j = [np.array([], dtype=np.int64)], [np.array([], dtype=np.int64)]
+    for b in range(BANDAS_SIMHASH):
+        chaves = (assinaturas >> np.uint64(16 * b)) & np.uint64(0xFFFF)
+        ordem = np.argsort(chaves, kind="stable")
+        ordenadas = chaves[ordem]
+        inicios = np.flatnonzero(np.r_[True, ordenadas[1:] != ordenadas[:-1]])
+        # Posição de cada documento no seu balde = quantos anteriores ele tem para comparar
+        anteriores = np.arange(n) - np.repeat(inicios, np.diff(np.r_[inicios, n]))
+        acumulado = np.cumsum(anteriores)
+        cortes = np.searchsorted(acumulado, np.arange(MAX_PARES_BLOCO, acumulado[-1], MAX_PARES_BLOCO))
+        for inicio, fim in zip(np.r_[0, cortes], np.r_[cortes, n]):
+            quantos = anteriores[inicio:fim]
+            i = np.repeat(np.arange(inicio, fim), quantos)
+            j = i - (np.arange(len(i)) - np.repeat(np.cumsum(quantos) - quantos, quantos) + 1)
+            # Ordenação estável: dentro do balde, anterior na ordem = anterior na série
+            i, j = ordem[i], ordem[j]
+            perto = _distancias(assinaturas[i], assinaturas[j]) <= distancia_max
+            proximos_i.append(i[perto])
+            proximos_j.append(j[perto])
+    return np.concatenate(proximos_i), np.concatenate(proximos_j)
+
+
+def manter_distintos(posicoes, codigos, vocabulario, n_documentos, distancia_max=DISTANCIA_MAX_DUPLICATA):
+    """Máscara que mantém só a primeira ocorrência de documentos quase idênticos (SimHash).
+
+    Um documento sai quando está a até `distancia_max` bits de um documento anterior mantido.
+    """
+    assinaturas = _assinaturas_simhash(posicoes, codigos, vocabulario, n_documentos)
+    # Cópias exatas saem direto; só a primeira ocorrência de cada assinatura é comparada
+    _, primeiros = np.unique(assinaturas, return_index=True)
+    primeiros = np.sort(primeiros)
+    manter = np.zeros(len(assinaturas), dtype=bool)
+    if len(primeiros):
+        i, j = _pares_proximos(assinaturas[primeiros], distancia_max)
+        # Em ordem de i, a situação de cada j (< i) já está decidida
+        ordem = np.argsort(i, kind="stable")
+        mantidos = [True] * len(primeiros)
+        for a, b in zip(i[ordem].tolist(), j[ordem].tolist()):
+            if mantidos[b]:
+                mantidos[a] = False
+        manter[primeiros[np.array(mantidos)]] = True
+    return manter
+
+
+class IndiceTermos:
+    """Frequência de documento de cada termo, sobre os códigos inteiros de `codificar`."""
+
+    def __init__(self, posicoes, codigos, vocabulario):
+        self._contagens = np.bincount(codigos, minlength=len(vocabulario))
+        self._vocabulario = pd.Index(vocabulario, dtype=object)
+        self.n_documentos = len(np.unique(posicoes))
+
+    @classmethod
+    def de_textos(cls, serie, sem_quase_duplicatas=False):
+        posicoes, codigos, vocabulario = codificar(serie)
+        if sem_quase_duplicatas:
+            # Mesma tokenização para a deduplicação e para o índice
+            manter = manter_distintos(posicoes, codigos, vocabulario, len(serie))[posicoes]
+            posicoes, codigos = posicoes[manter], codigos[manter]
+        return cls(posicoes, codigos, vocabulario)
+
+    def frequencia_minima(self, posicoes, codigos, vocabulario, n_itens):
+        """Para cada item codificado por `codificar`, a frequência de documento do seu termo mais raro.
+
+        Não é uma contagem de menções: é exata para itens de um termo e um limite superior da
+        co-ocorrência para os demais.
+        """
+        frequencia = np.zeros(n_itens)
+        if len(posicoes):
+            # Termo fora do vocabulário do índice (-1): frequência zero
+            termos = self._vocabulario.get_indexer(vocabulario)[codigos]
+            freq_termos = np.where(termos >= 0, self._contagens[np.maximum(termos, 0)], 0)
+            inicios = np.flatnonzero(np.r_[True, posicoes[1:] != posicoes[:-1]])
+            frequencia[posicoes[inicios]] = np.minimum.reduceat(freq_termos, inicios)
+        return frequencia
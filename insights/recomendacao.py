@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+from data.instrumentacao import medir
+from insights.agregacoes import em_cache, versao_dados
+from insights.indice_termos import IndiceTermos, codificar
+
+# Pesos de cada componente da pontuação
+PESOS_PADRAO = {"popularidade": 0.5, "tendencias": 0.3, "x": 0.2}
+
+# Fatores da estratégia "escala": aproximam visualizações do YouTube da escala 0-100 do Spotify;
+# as frequências nas tendências e no X entram como fração dos documentos do índice, em porcentagem
+ESCALAS_PADRAO = {"spotify": 1.0, "youtube": 1 / 1000, "tendencias": 100.0, "x": 100.0}
+
+
+def _normalizar(valores, estrategia, escala=1.0):
+    valores = valores.astype("float64")
+    if not len(valores):
+        return valores
+    if estrategia == "escala":
+        return valores * escala
+    if estrategia == "minmax":
+        minimo, maximo = valores.min(), valores.max()
+        return (valores - minimo) / (maximo - minimo) if maximo > minimo else np.zeros_like(valores)
+    if estrategia == "zscore":
+        desvio = valores.std()
+        return (valores - valores.mean()) / desvio if desvio > 0 else np.zeros_like(valores)
+    if estrategia == "rank":
+        return pd.Series(valores).rank(pct=True).to_numpy()
+    raise ValueError(f"Estratégia de normalização desconhecida: {estrategia}")
+
+
+def _colunas_fonte(df, coluna_conteudo, coluna_valor):
+    if not isinstance(df, pd.DataFrame) or df.empty:
+        return np.array([], dtype=object), np.array([], dtype="float64")
+    valores = pd.to_numeric(df[coluna_valor], errors="coerce").fillna(0).to_numpy(dtype="float64")
+    return df[coluna_conteudo].to_numpy(dtype=object), valores
+
+
+def _versao(df, colunas):
+    return versao_dados(df if isinstance(df, pd.DataFrame) else pd.DataFrame(), colunas)
+
+
+def _textos(df, coluna):
+    if not isinstance(df, pd.DataFrame) or coluna not in df.columns:
+        return pd.Series(dtype=object)
+    return df[coluna]
+
+
+def _indice_trends(df_trends):
+    return em_cache(("indice_trends", _versao(df_trends, ["termo"])),
+                    lambda: IndiceTermos.de_textos(_textos(df_trends, "termo")))
+
+
+def _indice_x(df_x):
+    # Tweets quase idênticos contam uma vez só; SimHash e índice saem uma vez por versão dos dados
+    return em_cache(("indice_x", _versao(df_x, ["assunto"])),
+                    lambda: IndiceTermos.de_textos(_textos(df_x, "assunto"), sem_quase_duplicatas=True))
+
+
+def _catalogo(df_spotify, df_youtube, df_trends, df_x):
+    """Itens sem repetição e suas frequências nos índices; o que não depende dos pesos, uma vez por versão."""
+    def calcular():
+        conteudo_spotify, valores_spotify = _colunas_fonte(df_spotify, "nome", "popularidade")
+        conteudo_youtube, valores_youtube = _colunas_fonte(df_youtube, "titulo", "visualizacoes")
+        conteudo = np.concatenate([conteudo_spotify, conteudo_youtube])
+        # Conteúdos repetidos ficam com a última ocorrência, como no dicionário original
+        manter = ~pd.Series(conteudo).duplicated(keep="last").to_numpy()
+        itens = pd.Series(conteudo[manter])
+        # Catálogo tokenizado uma vez; os dois índices são consultados com os mesmos códigos
+        codificados = codificar(itens)
+        indice_trends, indice_x = _indice_trends(df_trends), _indice_x(df_x)
+        return {
+            "valores": {"spotify": valores_spotify, "youtube": valores_youtube},
+            "manter": manter,
+            "documentos": {"tendencias": indice_trends.n_documentos, "x": indice_x.n_documentos},
+            "itens": pd.DataFrame({
+                "conteudo": itens.to_numpy(),
+                "fonte": np.repeat(["spotify", "youtube"], [len(conteudo_spotify), len(conteudo_youtube)])[manter],
+                "freq_tendencias": indice_trends.frequencia_minima(*codificados, len(itens)),
+                "freq_x": indice_x.frequencia_minima(*codificados, len(itens)),
+            }),
+        }
+
+    chave = ("catalogo_recomendacao", _versao(df_spotify, ["nome", "popularidade"]),
+             _versao(df_youtube, ["titulo", "visualizacoes"]), _versao(df_trends, ["termo"]), _versao(df_x, ["assunto"]))
+    return em_cache(chave, calcular)
+
+
+@medir("analise", passo="recomendacao")
+def calcular_scores(df_spotify, df_youtube, df_trends, df_x, pesos=None, normalizacao="escala", escalas=None):
+    """Pontua músicas e vídeos com operações colunares.
+
+    A pontuação é `popularidade * peso + frequência nas tendências * peso + frequência no X
+    * peso`, os três componentes passados pela mesma `normalizacao` (as frequências como
+    fração dos documentos do índice). A frequência de um item é a frequência de documento do
+    seu termo normalizado mais raro (nos termos de tendência ou nos tweets, sem quase
+    duplicatas): exata para itens de um termo, limite superior das menções conjuntas para os demais.
+    Índices e frequências saem uma vez por versão dos dados; mudar pesos ou normalização
+    só refaz a soma ponderada.
+    """
+    pesos = {**PESOS_PADRAO, **(pesos or {})}
+    escalas = {**ESCALAS_PADRAO, **(escalas or {})}
+
+    catalogo = _catalogo(df_spotify, df_youtube, df_trends, df_x)
+    # Normalização por fonte sobre todos os valores, antes de descartar os repetidos
+    base = np.concatenate([np.array([], dtype="float64")] + [
+        _normalizar(valores, normalizacao, escalas.get(fonte, 1.0))
+        for fonte, valores in catalogo["valores"].items() if len(valores)
+    ])[catalogo["manter"]]
+    itens = catalogo["itens"]
+    impulsos = {
+        fonte: _normalizar(itens[f"freq_{fonte}"].to_numpy() / max(n_documentos, 1), normalizacao, escalas.get(fonte, 1.0))
+        for fonte, n_documentos in catalogo["documentos"].items()
+    }
+    return itens.assign(
+        base=base,
+        score=base * pesos["popularidade"] + impulsos["tendencias"] * pesos["tendencias"] + impulsos["x"] * pesos["x"],
+    )
+
+
+def top_recomendacoes(df_spotify, df_youtube, df_trends, df_x, k=5, **kwargs):
+    # nlargest faz seleção parcial, sem ordenar o catálogo inteiro
+    itens = calcular_scores(df_spotify, df_youtube, df_trends, df_x, **kwargs)
+    return itens.nlargest(k, "score")[["conteudo", "fonte", "score"]]
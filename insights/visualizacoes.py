@@ -1,12 +1,27 @@
 import streamlit as st
 import plotly.express as px
+from insights.agregacoes import agregar, em_cache, serie_temporal, versao_dados
+
+def _barras(dados, x, y, titulo):
+    # Figura montada uma vez por versão dos dados agregados
+    return em_cache(("figura_barras", versao_dados(dados), x, y, titulo),
+                    lambda: px.bar(dados, x=x, y=y, title=titulo))
+
+def _linha(dados, x, y, titulo):
+    return em_cache(("figura_linha", versao_dados(dados), x, y, titulo),
+                    lambda: px.line(dados, x=x, y=y, title=titulo))
 
 def gerar_visoes(df_spotify, df_youtube, df_trends, df_x):
     st.subheader("Visualizações")
     if not df_spotify.empty:
-        fig = px.bar(df_spotify.head(10), x="artista", y="popularidade", title="Popularidade por Artista (Spotify)")
-        st.plotly_chart(fig)
+        dados = agregar(df_spotify, "artista", "popularidade", "mean", top=10)
+        st.plotly_chart(_barras(dados, "artista", "popularidade", "Popularidade Média por Artista (Spotify)"))
     if not df_youtube.empty:
-        fig = px.bar(df_youtube.head(10), x="canal", y="visualizacoes", title="Visualizações por Canal (YouTube)")
-        st.plotly_chart(fig)
-    # Adicione mais visualizações para trends e x conforme necessário
+        dados = agregar(df_youtube, "canal", "visualizacoes", "sum", top=10)
+        st.plotly_chart(_barras(dados, "canal", "visualizacoes", "Visualizações por Canal (YouTube)"))
+    if not df_trends.empty and "termo" in df_trends.columns:
+        dados = agregar(df_trends, "termo", top=10)
+        st.plotly_chart(_barras(dados, "termo", "contagem", "Termos Mais Frequentes (Google Trends)"))
+    if not df_x.empty and {"created_at", "volume"} <= set(df_x.columns):
+        dados = serie_temporal(df_x, "created_at", "volume")
+        st.plotly_chart(_linha(dados, "created_at", "volume", "Volume de Impressões por Hora (X)"))
@@ -1,23 +1,25 @@
 import streamlit as st
 import pandas as pd
 import logging
+from data.instrumentacao import buffer_logs, configurar_logging, exportar_metricas, medir, metricas
 
-logging.basicConfig(level=logging.INFO)
+# Configuração única do logging (o buffer em memória alimenta "Mostrar Logs")
+configurar_logging()
 logger = logging.getLogger(__name__)
 
+def mostrar_logs(ultimas=200):
+    with st.expander("Mostrar Logs"):
+        st.code(buffer_logs.texto(ultimas=ultimas), language=None)
+
+# Só o caminho de leitura é importado no início; coletores, Supabase, plotly, mlxtend
+# e scikit-learn são importados dentro da seção que os usa
 try:
-    from data.spotify_data import coletar_dados_spotify
-    from data.youtube_data import coletar_dados_youtube
-    from data.google_trends import coletar_dados_trends
-    from data.x_data import coletar_dados_x
-    from data.supabase_manager import salvar_df_supabase, carregar_df_supabase
-    from insights.visualizacoes import gerar_visoes
-    from insights.aprendizado import analisar_apriori, analisar_clusters
+    from data.snapshots import carregar_com_snapshot
+    from data.esquemas import colunas, esquema_valido
 except ImportError as e:
     st.error(f"Erro ao importar módulos: {str(e)}. Verifique os diretórios 'data/' e 'insights/'.")
-    if st.button("Mostrar Logs"):
-        st.text(logger.handlers[0].stream.getvalue())
     logger.error(f"Erro de importação: {str(e)}")
+    mostrar_logs()
     st.stop()
 
 st.set_page_config(page_title="Radar Cultural Inteligente", layout="wide")
@@ -27,25 +29,50 @@ st.markdown("Análise automatizada de tendências culturais com IA aplicada.")
 if "dados_carregados" not in st.session_state:
     st.session_state.dados_carregados = False
 
+ignorar_cache = st.checkbox("Ignorar cache das APIs", value=False,
+                            help="Força novas chamadas mesmo com respostas recentes em cache.")
 if st.button("🔄 Coletar Novos Dados"):
     with st.spinner("Coletando dados de todas as plataformas..."):
         try:
-            df_spotify = coletar_dados_spotify()
-            df_youtube = coletar_dados_youtube()
-            df_trends = coletar_dados_trends()
-            df_x = coletar_dados_x()
-
-            dataframes = {"spotify": df_spotify, "youtube": df_youtube, "trends": df_trends, "twitter": df_x}
+            from data.coleta import coletar_fontes, coletores_padrao
+            from data.limites import relatorio_cotas
+            from data.cache_respostas import cache
+            from data.supabase_manager import salvar_df_supabase
+            from data.snapshots import salvar_snapshot
+            from insights.clusterizacao import atualizar_clusters
+
+            dataframes, status_coleta = coletar_fontes(coletores_padrao(usar_cache=not ignorar_cache))
             all_valid = True
-            for name, df in dataframes.items():
-                if not isinstance(df, pd.DataFrame):
-                    st.error(f"Falha ao coletar dados de {name}: Dados inválidos.")
+            for name, info in status_coleta.items():
+                if info["status"] == "timeout":
+                    st.error(f"Coleta de {name} excedeu o prazo ({info['latencia']:.1f}s).")
                     all_valid = False
-                elif df.empty:
+                elif info["status"] == "erro":
+                    st.error(f"Falha ao coletar dados de {name}: {info['erro']}")
+                    all_valid = False
+                elif info["status"] == "vazio":
                     st.warning(f"Dados de {name} estão vazios. Verifique APIs ou conexão.")
                 else:
-                    salvar_df_supabase(df, name)
-                    st.success(f"Dados de {name} salvos: {len(df)} registros.")
+                    salvo = salvar_df_supabase(dataframes[name], name)
+                    salvar_snapshot(dataframes[name], name)
+                    st.session_state.tabelas_desatualizadas = True
+                    if salvo:
+                        st.success(f"Dados de {name} salvos: {info['registros']} registros ({info['latencia']:.1f}s).")
+                    else:
+                        st.error(f"Dados de {name} coletados ({info['registros']} registros), mas a gravação no "
+                                 f"Supabase falhou. Veja os logs.")
+                        all_valid = False
+            # Clusters aprendem só com o lote recém-coletado
+            atualizar_clusters(dataframes.get("spotify"), dataframes.get("youtube"))
+            st.dataframe(pd.DataFrame.from_dict(status_coleta, orient="index")[["status", "latencia", "registros"]])
+            st.caption("Cotas das APIs (uso contado neste processo; a coleta headless tem a sua contagem)")
+            st.dataframe(pd.DataFrame.from_dict(relatorio_cotas(), orient="index"))
+            st.caption("Cache de respostas")
+            st.dataframe(pd.DataFrame.from_dict(cache.estatisticas(), orient="index"))
+            try:
+                exportar_metricas()
+            except OSError as e:
+                logger.error(f"Não foi possível exportar métricas: {str(e)}")
             if all_valid:
                 st.session_state.dados_carregados = True
                 st.success("✅ Dados coletados e salvos!")
@@ -54,40 +81,39 @@ if st.button("🔄 Coletar Novos Dados"):
                 st.warning("Alguns dados falharam. Visualizações com dados disponíveis.")
         except Exception as e:
             st.error(f"Erro na coleta: {str(e)}. Verifique logs para detalhes.")
-            if st.button("Mostrar Logs"):
-                st.text(logger.handlers[0].stream.getvalue())
+            logger.error(f"Erro na coleta: {str(e)}")
+            mostrar_logs()
             st.session_state.dados_carregados = False
 
-@st.cache_data
+def _atualizar_remoto(tabela, desde):
+    # Só o que mudou no Supabase depois da marca guardada no snapshot (tudo, sem marca)
+    from data.supabase_manager import carregar_df_supabase_incremental
+    return carregar_df_supabase_incremental(tabela, colunas(tabela), desde)
+
+# TTL como rede de segurança; gravações feitas nesta sessão limpam o cache explicitamente.
+# As tabelas já chegam tipadas e validadas (data/esquemas.py); o resultado viaja em df.attrs.
+@st.cache_data(ttl=600)
 def carregar_tabelas():
     try:
         return {
-            "spotify": carregar_df_supabase("spotify", ["nome", "artista", "popularidade"]),
-            "youtube": carregar_df_supabase("youtube", ["titulo", "canal", "visualizacoes"]),
-            "trends": carregar_df_supabase("trends", ["termo"]),
-            "twitter": carregar_df_supabase("twitter", ["assunto", "volume", "created_at"])
+            tabela: carregar_com_snapshot(tabela, colunas(tabela), lambda desde, t=tabela: _atualizar_remoto(t, desde))
+            for tabela in ["spotify", "youtube", "trends", "twitter"]
         }
     except Exception as e:
         st.error(f"Erro ao carregar tabelas: {str(e)}")
         logger.error(f"Erro ao carregar tabelas: {str(e)}")
         return {"spotify": pd.DataFrame(), "youtube": pd.DataFrame(), "trends": pd.DataFrame(), "twitter": pd.DataFrame()}
 
+# Nova coleta gravada no snapshot local: descarta a leitura em cache
+if st.session_state.pop("tabelas_desatualizadas", False):
+    carregar_tabelas.clear()
 tabelas = carregar_tabelas()
 df_spotify, df_youtube, df_trends, df_x = tabelas["spotify"], tabelas["youtube"], tabelas["trends"], tabelas["twitter"]
 
-def validar_dados(df, fonte, colunas_esperadas):
-    if not isinstance(df, pd.DataFrame) or df.empty:
-        logger.warning(f"Dados de {fonte} estão vazios ou inválidos")
-        return False
-    if not all(col in df.columns for col in colunas_esperadas):
-        logger.warning(f"Faltam colunas em {fonte}: {colunas_esperadas}")
-        return False
-    return True
-
-if not (validar_dados(df_spotify, "Spotify", ["nome", "artista", "popularidade"]) or
-        validar_dados(df_youtube, "YouTube", ["titulo", "canal", "visualizacoes"]) or
-        validar_dados(df_trends, "Google Trends", ["termo"]) or
-        validar_dados(df_x, "X", ["assunto", "volume", "created_at"])):
+# Validação feita uma vez na ingestão; aqui só se lê o resultado guardado em cada DataFrame
+validos = {fonte: esquema_valido(df, fonte) for fonte, df in tabelas.items()}
+
+if not any(validos.values()):
     st.warning("Dados carregados podem estar incompletos. Verifique a coleta.")
 
 st.header("📊 Dados Coletados")
@@ -101,66 +127,62 @@ for table, df in [("Spotify", df_spotify), ("YouTube", df_youtube), ("Google Tre
 if st.session_state.dados_carregados:
     try:
         st.header("📈 Visualizações e Insights")
-        if validar_dados(df_spotify, "Spotify", ["nome", "artista", "popularidade"]) or \
-           validar_dados(df_youtube, "YouTube", ["titulo", "canal", "visualizacoes"]) or \
-           validar_dados(df_trends, "Google Trends", ["termo"]) or \
-           validar_dados(df_x, "X", ["assunto", "volume", "created_at"]):
-            gerar_visoes(df_spotify, df_youtube, df_trends, df_x)
+        if any(validos.values()):
+            from insights.visualizacoes import gerar_visoes
+            with medir("render", secao="visualizacoes"):
+                gerar_visoes(df_spotify, df_youtube, df_trends, df_x)
         else:
             st.warning("Sem dados válidos para gerar visualizações.")
 
-        if validar_dados(df_trends, "Google Trends", ["termo"]) and validar_dados(df_x, "X", ["assunto", "volume", "created_at"]):
+        if validos["trends"] and validos["twitter"]:
             st.subheader("🧠 Análise de Regras de Associação (Apriori)")
-            analisar_apriori(df_trends, df_x)
+            from insights.aprendizado import analisar_apriori
+            with medir("render", secao="apriori"):
+                analisar_apriori(df_trends, df_x)
         else:
             st.warning("Sem dados suficientes para análise Apriori.")
 
-        if validar_dados(df_spotify, "Spotify", ["nome", "artista", "popularidade"]) and \
-           validar_dados(df_youtube, "YouTube", ["titulo", "canal", "visualizacoes"]):
+        if validos["spotify"] and validos["youtube"]:
             st.subheader("🧠 Análise de Clusters")
-            analisar_clusters(df_spotify, df_youtube)
+            from insights.aprendizado import analisar_clusters
+            with medir("render", secao="clusters"):
+                analisar_clusters(df_spotify, df_youtube)
         else:
             st.warning("Sem dados suficientes para análise de clusters.")
     except Exception as e:
         st.error(f"Erro em visualizações/análises: {str(e)}. Verifique logs.")
-        if st.button("Mostrar Logs"):
-            st.text(logger.handlers[0].stream.getvalue())
+        logger.error(f"Erro em visualizações/análises: {str(e)}")
+        mostrar_logs()
 
     # Pesquisa Operacional para Recomendação de Conteúdo
     st.header("🤖 Recomendações para Produção de Conteúdo")
-    if not df_spotify.empty and not df_youtube.empty and not df_trends.empty and not df_x.empty:
-        # Normalizar popularidade (0-100) e volume (ponderar por tendência)
-        df_spotify['score'] = df_spotify['popularidade']
-        df_youtube['score'] = df_youtube['visualizacoes'] / 1000  # Aproximar escala
-        df_trends_weight = df_trends['termo'].value_counts().head(10).to_dict()
-        df_x_weight = df_x['assunto'].value_counts().head(10).to_dict()
-
-        # Combinar scores com pesos de tendências
-        recommendations = {}
-        for idx, row in df_spotify.iterrows():
-            termo = row['nome']
-            score = row['score'] * 0.5  # Peso para popularidade
-            if termo in df_trends_weight:
-                score += df_trends_weight[termo] * 0.3  # Peso para tendências
-            if termo in df_x_weight:
-                score += df_x_weight[termo] * 0.2  # Peso para volume no X
-            recommendations[termo] = score
-
-        for idx, row in df_youtube.iterrows():
-            termo = row['titulo']
-            score = row['score'] * 0.5
-            if termo in df_trends_weight:
-                score += df_trends_weight[termo] * 0.3
-            if termo in df_x_weight:
-                score += df_x_weight[termo] * 0.2
-            recommendations[termo] = score
-
-        # Ordenar e exibir top 5 recomendações
-        top_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)[:5]
-        st.subheader("Top 5 Conteúdos Sugeridos")
-        for conteudo, score in top_recommendations:
-            st.write(f"- {conteudo} (Pontuação: {score:.2f})")
+    if all(validos.values()):
+        from insights.recomendacao import top_recomendacoes, PESOS_PADRAO
+        with st.expander("⚙️ Pesos da recomendação"):
+            normalizacao = st.selectbox("Normalização", ["escala", "minmax", "zscore", "rank"])
+            pesos = {
+                "popularidade": st.slider("Popularidade", 0.0, 1.0, PESOS_PADRAO["popularidade"]),
+                "tendencias": st.slider("Google Trends", 0.0, 1.0, PESOS_PADRAO["tendencias"]),
+                "x": st.slider("X", 0.0, 1.0, PESOS_PADRAO["x"]),
+            }
+        with medir("render", secao="recomendacoes"):
+            top_recommendations = top_recomendacoes(df_spotify, df_youtube, df_trends, df_x, k=5,
+                                                    pesos=pesos, normalizacao=normalizacao)
+            st.subheader("Top 5 Conteúdos Sugeridos")
+            for conteudo, score in zip(top_recommendations["conteudo"], top_recommendations["score"]):
+                st.write(f"- {conteudo} (Pontuação: {score:.2f})")
     else:
         st.warning("Sem dados suficientes para recomendar conteúdo.")
 else:
     st.info("Clique em '🔄 Coletar Novos Dados' para iniciar.")
+
+# Tempos por etapa e contadores acumulados pelo processo (coletas, APIs, armazenamento, análises, renderização)
+with st.sidebar.expander("📈 Métricas do pipeline"):
+    etapas = pd.DataFrame(metricas.etapas())
+    if etapas.empty:
+        st.caption("Nenhuma etapa medida ainda.")
+    else:
+        st.dataframe(etapas.sort_values("total_s", ascending=False), hide_index=True)
+        st.dataframe(pd.DataFrame(metricas.contadores()), hide_index=True)
+        st.download_button("Exportar métricas (Prometheus)", metricas.prometheus(), file_name="radar.prom")
+    st.code(buffer_logs.texto(ultimas=50), language=None)
@@ -0,0 +1,24 @@
+import pandas as pd
+from data import coleta
+
+
+def _paginas(n, tamanho):
+    return (pd.DataFrame({"id": [str(i) for i in range(inicio, min(inicio + tamanho, n))]}) for inicio in range(0, n, tamanho))
+
+
+def test_gravador_que_devolve_false_conta_como_falha():
+    def salvar_df_supabase(df, fonte):
+        return False
+
+    def salvar_snapshot(df, fonte):
+        return "parte.parquet"
+
+    falhas = {}
+    total = coleta.transmitir_lotes(_paginas(25, 10), "twitter", [salvar_df_supabase, salvar_snapshot],
+                                    tamanho_lote=10, falhas=falhas)
+    assert total == 25
+    assert falhas == {"twitter": {"salvar_df_supabase"}}
+
+    status = {"twitter": {"status": "ok", "latencia": 0.0, "registros": total, "erro": None}}
+    coleta._marcar_falhas(status, falhas)
+    assert status["twitter"]["status"] == "erro_gravacao"
@@ -0,0 +1,21 @@
+import pandas as pd
+from data.esquemas import aplicar_esquema, esquema_valido
+
+
+def _spotify():
+    return aplicar_esquema(pd.DataFrame({"nome": ["a"], "artista": ["x"], "popularidade": [1]}), "spotify")
+
+
+def test_projecao_sem_colunas_obrigatorias_nao_e_valida():
+    df = _spotify()
+    assert esquema_valido(df, "spotify")
+    # A projeção herda attrs da tabela validada, mas não tem mais o que a fonte exige
+    assert not esquema_valido(df[["nome"]], "spotify")
+    assert aplicar_esquema(df[["nome"]], "spotify").attrs["esquema"]["valido"] is False
+
+
+def test_data_das_tendencias_e_date():
+    df = aplicar_esquema(pd.DataFrame({"termo": ["a", "b", "c"], "data": ["2026-10-18", "2026-10-18T00:00:00", "x"]}), "trends")
+    assert str(df["data"].dtype).startswith("date32")
+    assert df["data"].astype(str).tolist()[:2] == ["2026-10-18", "2026-10-18"]
+    assert df["data"].isna().tolist() == [False, False, True]
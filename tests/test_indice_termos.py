@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from insights.indice_termos import IndiceTermos, codificar, manter_distintos
+
+# 60 termos distintos: um termo a mais muda poucos bits da assinatura
+LONGO = " ".join(f"palavra{i:02d}" for i in range(60))
+
+
+def _manter(textos):
+    serie = pd.Series(textos)
+    return manter_distintos(*codificar(serie), len(serie)).tolist()
+
+
+def test_copias_e_quase_copias_saem_e_a_primeira_fica():
+    textos = [
+        "Show de rock hoje",
+        "SHOW de rock hoje! https://x.co/a",  # mesmos termos após normalizar
+        LONGO,
+        LONGO + " bonus",  # 2 bits de distância
+        "partida de futebol amanha",
+        "hoje rock show",  # mesmos termos em outra ordem
+    ]
+    assert _manter(textos) == [True, False, True, False, True, False]
+
+
+def test_textos_diferentes_ficam():
+    assert _manter(["show de rock", "partida de futebol", "receita de bolo", None]) == [True, True, True, True]
+
+
+def test_indice_sem_quase_duplicatas_conta_cada_texto_uma_vez():
+    serie = pd.Series(["show de rock", "Show de Rock!", "rock nacional"])
+    assert IndiceTermos.de_textos(serie).n_documentos == 3
+    indice = IndiceTermos.de_textos(serie, sem_quase_duplicatas=True)
+    assert indice.n_documentos == 2
+    itens = pd.Series(["rock"])
+    assert indice.frequencia_minima(*codificar(itens), len(itens)).tolist() == [2]
+
+
+def test_frequencia_minima_usa_o_termo_mais_raro():
+    indice = IndiceTermos.de_textos(pd.Series(["show de rock", "rock nacional", "rock e samba", "samba enredo"]))
+    itens = pd.Series(["Rock", "samba rock", "show rock", "forro", "rock forro", "", "de para"])
+    frequencia = indice.frequencia_minima(*codificar(itens), len(itens))
+    # Um termo: exata; vários: o mínimo; termo fora do índice, texto vazio ou só stopwords: zero
+    np.testing.assert_array_equal(frequencia, [3, 2, 1, 0, 0, 0, 0])
@@ -0,0 +1,91 @@
+import json
+import pandas as pd
+import pytest
+from benchmarks.sinteticos import ServidorPostgrest, gerar_trends, gerar_x
+from data import supabase_manager
+from data.esquemas import aplicar_esquema, deduplicar
+from data.supabase_manager import (_dividir_em_lotes, carregar_df_supabase, carregar_df_supabase_incremental,
+                                   salvar_df_supabase)
+
+
+@pytest.fixture(scope="module")
+def stub():
+    with ServidorPostgrest() as servidor:
+        yield servidor
+
+
+@pytest.fixture
+def supabase(stub, monkeypatch, tmp_path):
+    # Cache de respostas em diretório temporário e sem as esperas do backoff
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(supabase_manager.time, "sleep", lambda segundos: None)
+    stub.limpar()
+    return stub.cliente()
+
+
+def _spotify(nomes, popularidade=50):
+    return pd.DataFrame({"nome": nomes, "artista": ["artista"] * len(nomes), "popularidade": popularidade})
+
+
+def test_lotes_respeitam_linhas_e_bytes():
+    registros = [{"id": str(i), "assunto": "x" * (i % 50)} for i in range(1000)]
+    lotes = list(_dividir_em_lotes(registros, max_linhas=100, max_bytes=2000))
+    assert [r for lote in lotes for r in lote] == registros
+    for lote in lotes:
+        assert len(lote) <= 100
+        assert sum(len(json.dumps(r).encode()) for r in lote) <= 2000
+
+
+def test_registro_maior_que_o_limite_vai_sozinho():
+    registros = [{"assunto": "a"}, {"assunto": "b" * 500}, {"assunto": "c"}]
+    assert list(_dividir_em_lotes(registros, max_bytes=100)) == [[registros[0]], [registros[1]], [registros[2]]]
+
+
+def test_grava_em_lotes(stub, supabase):
+    df = gerar_x(35)
+    assert salvar_df_supabase(df, "twitter", max_linhas=10, supabase=supabase) is True
+    assert sorted(n for _, _, n in stub.requisicoes) == [5, 10, 10, 10]
+    assert {linha["id"] for linha in stub.linhas("twitter")} == set(df["id"])
+
+
+def test_upsert_nao_duplica_linhas(stub, supabase):
+    assert salvar_df_supabase(_spotify(["a", "b", "c"]), "spotify", supabase=supabase)
+    # Mesma chave natural: atualiza em vez de inserir; repetidas no lote ficam com a última
+    assert salvar_df_supabase(pd.concat([_spotify(["b", "c"], 70), _spotify(["c", "d"], 90)]), "spotify", supabase=supabase)
+    linhas = {linha["nome"]: linha["popularidade"] for linha in stub.linhas("spotify")}
+    assert linhas == {"a": 50, "b": 70, "c": 90, "d": 90}
+
+
+def test_lote_com_falha_e_repetido_sozinho(stub, supabase):
+    stub.falhar(1)
+    df = gerar_x(30)
+    assert salvar_df_supabase(df, "twitter", max_linhas=10, max_workers=1, supabase=supabase) is True
+    # 3 lotes + 1 nova tentativa só do lote que falhou
+    assert len(stub.requisicoes) == 4
+    assert len(stub.linhas("twitter")) == 30
+
+
+def test_falha_persistente_devolve_false(stub, supabase):
+    stub.falhar(2)
+    df = gerar_x(20)
+    assert salvar_df_supabase(df, "twitter", max_linhas=10, max_workers=1, max_retries=2, supabase=supabase) is False
+    # O primeiro lote esgotou as tentativas; o segundo foi gravado
+    assert len(stub.linhas("twitter")) == 10
+
+
+def test_data_das_tendencias_vai_e_volta_como_date(stub, supabase):
+    df = aplicar_esquema(gerar_trends(20), "trends")
+    assert salvar_df_supabase(df, "trends", supabase=supabase) is True
+    # Coluna `date` no Postgres: o PostgREST recebe só o dia, sem hora
+    assert {linha["data"] for linha in stub.linhas("trends")} == set(df["data"].astype(str))
+    lidos, _ = carregar_df_supabase_incremental("trends", ["termo", "data"], supabase=supabase)
+    assert str(lidos["data"].dtype).startswith("date32")
+    assert len(lidos) == len(deduplicar(df, "trends"))
+
+
+def test_paginas_nao_pulam_nem_repetem_linhas(stub, supabase):
+    nomes = [f"musica {i}" for i in range(95)]
+    assert salvar_df_supabase(_spotify(nomes), "spotify", supabase=supabase)
+    # O stub, como o Postgres, não garante ordem sem ORDER BY: a leitura precisa ordenar
+    df = carregar_df_supabase("spotify", ["nome", "artista", "popularidade"], tamanho_pagina=10, supabase=supabase)
+    assert sorted(df["nome"]) == sorted(nomes)